@@ -4,8 +4,9 @@ from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
-from .models import (Order, OrderProduct, Product, Restaurant,
+from .models import (Banner, Order, OrderProduct, Product, Restaurant,
                      RestaurantMenuItem)
+from .sales import get_order_fields, get_order_lines, record_order_change
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -24,6 +25,7 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'capacity',
     ]
     inlines = [
         RestaurantMenuItemInline
@@ -125,13 +127,30 @@ class OrderAdmin(admin.ModelAdmin):
         'firstname',
         'lastname',
         'phonenumber',
-        'status'
+        'status',
+        'total_price',
     ]
     readonly_fields = [
-        'registered_at'
+        'registered_at',
+        'total_price',
     ]
     inlines = [OrderProductInline]
 
+    def save_related(self, request, form, formsets, change):
+        order = form.instance
+        initial_lines = get_order_lines(order) if change else []
+        super().save_related(request, form, formsets, change)
+        order.update_total_price()
+
+        # Новый заказ ещё не учтён в сводках: post_save пропускает созданные
+        order_fields = get_order_fields(order)
+        record_order_change(
+            order_fields if change else None,
+            initial_lines,
+            order_fields,
+            get_order_lines(order),
+        )
+
     def response_post_save_change(self, request, obj):
         res = super().response_post_save_change(request, obj)
         if 'next' not in request.GET:
@@ -140,3 +159,54 @@ class OrderAdmin(admin.ModelAdmin):
             return redirect(request.GET['next'])
         else:
             return res
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'position',
+        'is_active',
+    ]
+    list_display_links = [
+        'title',
+    ]
+    list_editable = [
+        'position',
+        'is_active',
+    ]
+    list_filter = [
+        'is_active',
+    ]
+    readonly_fields = [
+        'get_image_preview',
+    ]
+    fields = [
+        'title',
+        'text',
+        'image',
+        'get_image_preview',
+        'position',
+        'is_active',
+    ]
+
+    def get_image_preview(self, obj):
+        if not obj.image:
+            return 'выберите картинку'
+        return format_html(
+            '<img src="{url}" style="max-height: 200px;"/>',
+            url=obj.image.url
+        )
+
+    get_image_preview.short_description = 'превью'
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html(
+            '<img src="{src}" style="max-height: 50px;"/>',
+            src=obj.image.url
+        )
+
+    get_image_list_preview.short_description = 'превью'
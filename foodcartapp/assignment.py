@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from places.distance import get_distance_matrix, get_greedy_assignment
+from places.get_place import find_places
+
+from .availability import availability_index
+from .models import Order, OrderProduct, Restaurant
+from .order_changes import bump_orders_version
+from .sales import record_orders_changes
+
+
+def get_remaining_capacities(restaurants, orders_count):
+    """Сколько ещё открытых заказов может взять каждый ресторан.
+
+    Ресторан без ограничения может взять все распределяемые заказы.
+    """
+    restaurants_load = dict(
+        Restaurant.objects.filter(pk__in=[rest.pk for rest in restaurants])
+        .annotate(open_orders_count=Count(
+            'orders', filter=Q(orders__status__lte=2)
+        ))
+        .values_list('pk', 'open_orders_count')
+    )
+    return [
+        orders_count if rest.capacity is None
+        else max(rest.capacity - restaurants_load[rest.pk], 0)
+        for rest in restaurants
+    ]
+
+
+def get_candidates_mask(bitmaps, restaurants):
+    """Булева матрица: может ли ресторан приготовить заказ целиком.
+
+    У многих заказов одинаковый состав, поэтому строка считается один раз
+    на каждую битовую маску.
+    """
+    restaurant_ids = [rest.pk for rest in restaurants]
+    mask_rows = {}
+    for bitmap in set(bitmaps):
+        mask_rows[bitmap] = [
+            bool(bitmap >> restaurant_id & 1)
+            for restaurant_id in restaurant_ids
+        ]
+    return np.array(
+        [mask_rows[bitmap] for bitmap in bitmaps], dtype=bool
+    ).reshape(len(bitmaps), len(restaurants))
+
+
+@transaction.atomic
+def assign_open_orders(dry_run=False):
+    """Назначает ресторан открытым заказам, у которых его ещё нет.
+
+    Учитываются только рестораны, где в продаже весь заказ, и их ёмкость.
+    Заказы и рестораны без координат пропускаются. Возвращает список пар
+    (id заказа, ресторан).
+    """
+    open_orders = Order.objects.filter(
+        status__lte=2, cook_restaurant__isnull=True,
+    )
+    orders = list(
+        open_orders.select_for_update()
+        .order_by('registered_at', 'id')
+        .values_list('id', 'address', 'registered_at', 'status')
+    )
+    order_lines = defaultdict(list)
+    order_products = OrderProduct.objects.filter(
+        order__in=open_orders
+    ).values_list('order_id', 'product_id', 'quantity', 'price')
+    for order_id, product_id, quantity, price in order_products:
+        order_lines[order_id].append((product_id, quantity, price))
+
+    places = find_places({address for _, address, *_ in orders})
+    located_orders = [
+        (order, places[order[1]]) for order in orders
+        if order[1] in places and places[order[1]].lon is not None
+    ]
+    restaurants = list(
+        Restaurant.objects.filter(lon__isnull=False, lat__isnull=False)
+    )
+    if not located_orders or not restaurants:
+        return []
+
+    bitmaps = [
+        availability_index.get_common_bitmap(
+            product_id for product_id, _, _ in order_lines[order[0]]
+        )
+        for order, _ in located_orders
+    ]
+    distances = get_distance_matrix(
+        [(place.lat, place.lon) for _, place in located_orders],
+        [(rest.lat, rest.lon) for rest in restaurants],
+        method=settings.DISTANCE_METHOD,
+    )
+    assignment = get_greedy_assignment(
+        distances,
+        get_remaining_capacities(restaurants, len(located_orders)),
+        mask=get_candidates_mask(bitmaps, restaurants),
+    )
+    assigned_orders = [
+        (order, restaurants[column])
+        for (order, _), column in zip(located_orders, assignment.tolist())
+        if column != -1
+    ]
+    result = [(order[0], rest) for order, rest in assigned_orders]
+    if dry_run or not assigned_orders:
+        return result
+
+    now = timezone.now()
+    Order.objects.bulk_update(
+        [
+            Order(id=order_id, cook_restaurant=rest, updated_at=now)
+            for (order_id, *_), rest in assigned_orders
+        ],
+        ['cook_restaurant', 'updated_at'],
+        batch_size=500,
+    )
+    record_orders_changes(
+        (
+            (registered_at, status, None),
+            (registered_at, status, rest.pk),
+            order_lines[order_id],
+        )
+        for (order_id, _, registered_at, status), rest in assigned_orders
+    )
+    transaction.on_commit(bump_orders_version)
+    return result
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from threading import RLock
+
+from django.core.cache import cache
+
+from .models import RestaurantMenuItem
+
+
+VERSION_CACHE_KEY = 'foodcartapp:availability_version'
+
+
+def iter_restaurant_ids(bitmap):
+    """Перебирает id ресторанов, чьи биты выставлены в битовой маске."""
+    while bitmap:
+        lowest_bit = bitmap & -bitmap
+        yield lowest_bit.bit_length() - 1
+        bitmap ^= lowest_bit
+
+
+class AvailabilityIndex:
+    """Битовые маски ресторанов, в которых товар есть в продаже.
+
+    Номер бита совпадает с id ресторана. Индекс строится из
+    RestaurantMenuItem при первом обращении и поддерживается сигналами.
+    Версия в кэше нужна, чтобы другие процессы узнали об изменениях и
+    перестроили свою копию индекса.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._bitmaps = None
+        self._version = None
+
+    def _build(self):
+        bitmaps = defaultdict(int)
+        menu_items = RestaurantMenuItem.objects.filter(
+            availability=True
+        ).values_list('product_id', 'restaurant_id')
+        for product_id, restaurant_id in menu_items:
+            bitmaps[product_id] |= 1 << restaurant_id
+        return bitmaps
+
+    def _get_bitmaps(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        with self._lock:
+            if self._bitmaps is None or self._version != version:
+                self._bitmaps = self._build()
+                self._version = version
+            return self._bitmaps
+
+    def _bump_version(self):
+        cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+        return cache.incr(VERSION_CACHE_KEY)
+
+    def get_bitmap(self, product_id):
+        return self._get_bitmaps().get(product_id, 0)
+
+    def get_common_bitmap(self, product_ids):
+        """Маска ресторанов, где в продаже все перечисленные товары."""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        bitmaps = self._get_bitmaps()
+        common_bitmap = bitmaps.get(product_ids[0], 0)
+        for product_id in product_ids[1:]:
+            common_bitmap &= bitmaps.get(product_id, 0)
+        return common_bitmap
+
+    def is_available(self, product_id, restaurant_id):
+        return bool(self.get_bitmap(product_id) >> restaurant_id & 1)
+
+    def set_availability(self, product_id, restaurant_id, available):
+        with self._lock:
+            bitmaps = self._get_bitmaps()
+            if available:
+                bitmaps[product_id] |= 1 << restaurant_id
+            else:
+                bitmaps[product_id] &= ~(1 << restaurant_id)
+            version = self._bump_version()
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                # Кто-то ещё менял меню, перестроим индекс при следующем чтении
+                self._bitmaps = None
+
+    def reset(self):
+        with self._lock:
+            self._bitmaps = None
+            self._bump_version()
+
+
+availability_index = AvailabilityIndex()
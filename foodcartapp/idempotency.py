@@ -0,0 +1,64 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже использован с другим телом запроса или ещё в работе."""
+
+
+def get_request_hash(data):
+    dumped_data = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(dumped_data.encode()).hexdigest()
+
+
+def claim_idempotency_key(key, data):
+    """Занимает ключ или возвращает ранее сохранённый под ним ответ.
+
+    Вызывается внутри транзакции. Первый запрос вставляет строку с ключом,
+    конкурентный запрос с тем же ключом ждёт на уникальном индексе, пока
+    первый не завершится, и затем получает его ответ. Если первый запрос
+    откатится, ключ достанется второму.
+
+    Возвращает пару (ключ, повтор). Для повтора в ключе уже лежит ответ.
+    """
+    request_hash = get_request_hash(data)
+    now = timezone.now()
+    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+
+    try:
+        with transaction.atomic():
+            idempotency_key = IdempotencyKey.objects.create(
+                key=key,
+                request_hash=request_hash,
+                expires_at=now + timedelta(
+                    seconds=settings.IDEMPOTENCY_KEY_TTL
+                ),
+            )
+        return idempotency_key, False
+    except IntegrityError:
+        idempotency_key = IdempotencyKey.objects.get(key=key)
+
+    if idempotency_key.request_hash != request_hash:
+        raise IdempotencyConflict(
+            'Ключ уже использован для другого запроса'
+        )
+    if idempotency_key.response_status is None:
+        raise IdempotencyConflict('Запрос с этим ключом ещё обрабатывается')
+    return idempotency_key, True
+
+
+def save_idempotent_response(idempotency_key, order, response):
+    idempotency_key.order = order
+    idempotency_key.response_status = response.status_code
+    idempotency_key.response_data = response.data
+    idempotency_key.save(
+        update_fields=['order', 'response_status', 'response_data']
+    )
@@ -0,0 +1,32 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_open_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Назначает открытым заказам без ресторана ближайший ресторан, '
+        'где есть весь заказ, с учётом ёмкости ресторанов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать распределение, не сохраняя его',
+        )
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        assigned_orders = assign_open_orders(dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started_at
+
+        restaurants_load = Counter(rest for _, rest in assigned_orders)
+        for restaurant, orders_count in restaurants_load.most_common():
+            self.stdout.write(f'{restaurant}: {orders_count}')
+        self.stdout.write(
+            f'Назначено заказов: {len(assigned_orders)} за {elapsed:.2f} с'
+        )
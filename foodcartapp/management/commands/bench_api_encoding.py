@@ -0,0 +1,79 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+
+from foodcartapp.renderers import dump_json
+from foodcartapp.snapshots import serialize_products
+
+
+def get_synthetic_products(count):
+    return [
+        {
+            'id': number,
+            'name': f'Бургер {number}',
+            'price': Decimal('349.00') + number,
+            'special_status': number % 5 == 0,
+            'description': 'Сочная котлета, сыр чеддер, маринованный огурец',
+            'category': {'id': number % 7, 'name': 'Бургеры'},
+            'image': f'/media/burger_{number}.jpg',
+            'restaurant': {'id': number, 'name': f'Бургер {number}'},
+        }
+        for number in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает размер и время кодирования ответа /api/products/: '
+        'JsonResponse с отступами против компактного dump_json'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int, nargs='+', default=[50, 500, 5000],
+            help='Размеры синтетического каталога',
+        )
+        parser.add_argument(
+            '--from-db', action='store_true',
+            help='Взять реальный каталог из базы',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            payloads = [serialize_products()]
+        else:
+            payloads = [
+                get_synthetic_products(count)
+                for count in options['products']
+            ]
+
+        self.stdout.write(
+            'products\tbefore, bytes\tafter, bytes\t'
+            'before, ms\tafter, ms'
+        )
+        for payload in payloads:
+            before_body, before_time = self.measure(
+                lambda: JsonResponse(payload, safe=False, json_dumps_params={
+                    'ensure_ascii': False,
+                    'indent': 4,
+                }).content,
+                options['repeat'],
+            )
+            after_body, after_time = self.measure(
+                lambda: dump_json(payload),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'{len(payload)}\t{len(before_body)}\t{len(after_body)}\t'
+                f'{before_time * 1000:.2f}\t{after_time * 1000:.2f}'
+            )
+
+    @staticmethod
+    def measure(encode, repeat):
+        started_at = time.perf_counter()
+        for _ in range(repeat):
+            body = encode()
+        return body, (time.perf_counter() - started_at) / repeat
@@ -0,0 +1,148 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodcartapp.availability import availability_index
+from foodcartapp.models import (Order, OrderProduct, Product, Restaurant,
+                                RestaurantMenuItem)
+
+
+def legacy_available_restaurants(orders):
+    available_menu_items = RestaurantMenuItem.objects.filter(
+        availability=True
+    ).select_related('restaurant', 'product')
+
+    for order in orders:
+        order.restaurants = set()
+        for order_item in order.products.all():
+            product_restaurants = [
+                rest_item.restaurant for rest_item in available_menu_items
+                if order_item.id == rest_item.product.id
+            ]
+            if not order.restaurants:
+                order.restaurants = set(product_restaurants)
+            order.restaurants &= set(product_restaurants)
+    return orders
+
+
+def check_scratch_database():
+    """Замер создаёт свои заказы и меню, поэтому база должна быть пустой.
+
+    Так он не смешивает свои данные с настоящими и не держит блокировки
+    на рабочих таблицах.
+    """
+    for model in [Order, Restaurant, Product, RestaurantMenuItem]:
+        if model.objects.exists():
+            raise CommandError(
+                'База не пустая, замер запускается только на отдельной '
+                'базе. Например: DB_URL=sqlite:////tmp/bench.sqlite3 '
+                'python manage.py migrate, а затем с тем же DB_URL '
+                'python manage.py bench_available_restaurants'
+            )
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость поиска ресторанов, способных приготовить заказ, '
+        'на синтетических данных. Запускается только на пустой базе, '
+        'данные откатываются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders', type=int, nargs='+', default=[100, 500, 1000, 2000],
+        )
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--products', type=int, default=50)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument(
+            '--skip-legacy', action='store_true',
+            help='Не замерять старый алгоритм (он квадратичный)',
+        )
+
+    def handle(self, *args, **options):
+        check_scratch_database()
+        random.seed(0)
+        self.stdout.write('orders\tmenu_items\tlegacy, s\tindexed, s')
+        for orders_count in options['orders']:
+            with transaction.atomic():
+                menu_items_count = self.populate(
+                    orders_count,
+                    options['restaurants'],
+                    options['products'],
+                    options['items_per_order'],
+                )
+                # Сигналы на bulk_create не срабатывают, перестроим индекс
+                availability_index.reset()
+                orders = Order.objects.all()
+
+                legacy_time = None
+                if not options['skip_legacy']:
+                    legacy_time = self.measure(
+                        lambda: legacy_available_restaurants(
+                            orders.prefetch_related('products')
+                        )
+                    )
+                indexed_time = self.measure(
+                    lambda: orders.get_available_restaurants()
+                )
+                transaction.set_rollback(True)
+            availability_index.reset()
+
+            self.stdout.write('{}\t{}\t{}\t{:.4f}'.format(
+                orders_count,
+                menu_items_count,
+                '-' if legacy_time is None else f'{legacy_time:.4f}',
+                indexed_time,
+            ))
+
+    @staticmethod
+    def measure(find_restaurants):
+        started_at = time.perf_counter()
+        find_restaurants()
+        return time.perf_counter() - started_at
+
+    @staticmethod
+    def populate(orders_count, restaurants_count, products_count,
+                 items_per_order):
+        Restaurant.objects.bulk_create(
+            Restaurant(name=f'Ресторан {number}')
+            for number in range(restaurants_count)
+        )
+        restaurants = list(Restaurant.objects.all())
+        Product.objects.bulk_create(
+            Product(name=f'Товар {number}', price=100, image='')
+            for number in range(products_count)
+        )
+        products = list(Product.objects.all())
+
+        menu_items = RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(
+                restaurant=restaurant,
+                product=product,
+                availability=random.random() < 0.8,
+            )
+            for restaurant in restaurants
+            for product in products
+        )
+
+        for number in range(orders_count):
+            ordered_products = random.sample(products, items_per_order)
+            order = Order.objects.create(
+                phonenumber='+79000000000',
+                firstname=f'Клиент {number}',
+                address=f'Адрес {number}',
+                total_price=sum(product.price for product in ordered_products),
+            )
+            OrderProduct.objects.bulk_create(
+                OrderProduct(
+                    order=order,
+                    product=product,
+                    quantity=1,
+                    price=product.price,
+                )
+                for product in ordered_products
+            )
+        return len(menu_items)
@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+class Command(BaseCommand):
+    help = 'Копирует недостающие картинки баннеров из assets/ в медиафайлы'
+
+    def handle(self, *args, **options):
+        copied_count = 0
+        for banner in Banner.objects.exclude(image=''):
+            if default_storage.exists(banner.image.name):
+                continue
+            asset_path = os.path.join(
+                settings.BASE_DIR,
+                'assets',
+                os.path.basename(banner.image.name),
+            )
+            if not os.path.exists(asset_path):
+                self.stderr.write(f'Не найдена картинка баннера: {banner}')
+                continue
+            with open(asset_path, 'rb') as image:
+                default_storage.save(banner.image.name, File(image))
+            copied_count += 1
+
+        self.stdout.write(f'Скопировано картинок: {copied_count}')
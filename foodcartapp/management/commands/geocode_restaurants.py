@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from foodcartapp.models import Restaurant
+from foodcartapp.restaurant_index import restaurant_index
+from places.geohash import encode_geohash
+from places.get_place import get_places
+
+
+class Command(BaseCommand):
+    help = 'Заполняет координаты ресторанов по их адресам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать координаты всех ресторанов, а не только пустые',
+        )
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.exclude(address='')
+        if not options['all']:
+            restaurants = restaurants.filter(
+                Q(lon__isnull=True) | Q(lat__isnull=True)
+            )
+        restaurants = list(restaurants)
+
+        places = get_places(
+            [restaurant.address for restaurant in restaurants],
+        )
+
+        located_restaurants = []
+        for restaurant in restaurants:
+            place = places.get(restaurant.address)
+            if not place or place.lon is None or place.lat is None:
+                self.stderr.write(f'Не удалось найти адрес: {restaurant}')
+                continue
+            restaurant.lon, restaurant.lat = place.lon, place.lat
+            restaurant.geohash = encode_geohash(place.lat, place.lon)
+            located_restaurants.append(restaurant)
+
+        Restaurant.objects.bulk_update(
+            located_restaurants, ['lon', 'lat', 'geohash']
+        )
+        # bulk_update не вызывает сигналы, сбросим индекс ресторанов сами
+        restaurant_index.invalidate()
+        self.stdout.write(
+            f'Обновлено ресторанов: {len(located_restaurants)} '
+            f'из {len(restaurants)}'
+        )
@@ -0,0 +1,151 @@
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodcartapp.models import Order, OrderProduct, Product
+from foodcartapp.order_changes import bump_orders_version
+from foodcartapp.sales import get_lines, record_new_orders
+from foodcartapp.views import OrderSerializer, get_total_price
+from places.geocoding_queue import enqueue_addresses
+
+
+def read_batches(lines, batch_size):
+    numbered_lines = enumerate(lines, start=1)
+    while True:
+        batch = list(islice(numbered_lines, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_product_ids(payload):
+    product_ids = set()
+    if not isinstance(payload, dict):
+        return product_ids
+    products = payload.get('products')
+    if not isinstance(products, list):
+        return product_ids
+    for product in products:
+        try:
+            product_ids.add(int(product['product']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return product_ids
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заказы из JSONL-файла: одна строка — один заказ в формате '
+        'POST /api/order/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к JSONL-файлу с заказами')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--rejected',
+            default='rejected_orders.jsonl',
+            help='Куда записать строки, не прошедшие проверку',
+        )
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        imported_count = 0
+        rejected_count = 0
+
+        with open(options['path'], encoding='utf-8') as orders_file, \
+                open(options['rejected'], 'w', encoding='utf-8') as rejected:
+            for batch in read_batches(orders_file, options['batch_size']):
+                valid_orders, rejected_lines = self.validate_batch(batch)
+                self.save_orders(valid_orders)
+
+                for line_number, line, errors in rejected_lines:
+                    rejected.write(json.dumps({
+                        'line': line_number,
+                        'errors': errors,
+                        'payload': line.rstrip('\n'),
+                    }, ensure_ascii=False) + '\n')
+
+                imported_count += len(valid_orders)
+                rejected_count += len(rejected_lines)
+                elapsed = time.perf_counter() - started_at
+                self.stdout.write(
+                    f'Загружено: {imported_count}, отклонено: '
+                    f'{rejected_count}, '
+                    f'{(imported_count + rejected_count) / elapsed:.0f} '
+                    f'строк/с'
+                )
+
+        if rejected_count:
+            self.stdout.write(
+                f'Отклонённые строки записаны в {options["rejected"]}'
+            )
+
+    def validate_batch(self, batch):
+        payloads = []
+        rejected_lines = []
+        for line_number, line in batch:
+            if not line.strip():
+                continue
+            try:
+                payloads.append((line_number, line, json.loads(line)))
+            except json.JSONDecodeError as error:
+                rejected_lines.append((line_number, line, str(error)))
+
+        product_ids = set()
+        for _, _, payload in payloads:
+            product_ids |= get_product_ids(payload)
+        context = {'products': Product.objects.in_bulk(product_ids)}
+
+        valid_orders = []
+        for line_number, line, payload in payloads:
+            serializer = OrderSerializer(data=payload, context=context)
+            if serializer.is_valid():
+                valid_orders.append(serializer.validated_data)
+            else:
+                rejected_lines.append((line_number, line, serializer.errors))
+        rejected_lines.sort(key=lambda rejected_line: rejected_line[0])
+        return valid_orders, rejected_lines
+
+    @transaction.atomic
+    def save_orders(self, valid_orders):
+        orders = []
+        for order_data in valid_orders:
+            order_fields = dict(order_data)
+            products = order_fields.pop('products')
+            orders.append(Order(
+                total_price=get_total_price(products),
+                **order_fields
+            ))
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+
+        order_products = OrderProduct.objects.bulk_create(
+            [
+                OrderProduct(
+                    order=order,
+                    product=product['product'],
+                    quantity=product['quantity'],
+                    price=product['product'].price,
+                )
+                for order, order_data in zip(orders, valid_orders)
+                for product in order_data['products']
+            ],
+            batch_size=1000,
+        )
+        order_lines = defaultdict(list)
+        for order_product in order_products:
+            order_lines[order_product.order].append(order_product)
+        record_new_orders(
+            (order, get_lines(order_lines[order])) for order in orders
+        )
+        enqueue_addresses(order.address for order in orders)
+        transaction.on_commit(bump_orders_version)
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import ProductSales, RestaurantSales
+from foodcartapp.sales import rebuild_sales
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки продаж по ресторанам и товарам с нуля'
+
+    def handle(self, *args, **options):
+        started_at = time.perf_counter()
+        rows_count = rebuild_sales()
+        self.stdout.write(
+            f'Строк по ресторанам: {rows_count[RestaurantSales]}, '
+            f'по товарам: {rows_count[ProductSales]}, '
+            f'{time.perf_counter() - started_at:.1f} с'
+        )
@@ -0,0 +1,250 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def get_percentile(values, percent):
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def is_manager_path(path):
+    return urlsplit(path).path.startswith('/manager/')
+
+
+class InProcessTransport:
+    """Шлёт запросы в Django напрямую, без сети, и считает SQL-запросы.
+
+    Как и в жизни, менеджер входит только на страницы /manager/, а запросы
+    к API идут без сессии.
+    """
+
+    def __init__(self, host, manager):
+        self.host = host
+        self.manager = manager
+        self.local = threading.local()
+
+    def get_client(self, path):
+        logged_in = bool(self.manager) and is_manager_path(path)
+        clients = self.local.__dict__.setdefault('clients', {})
+        if logged_in not in clients:
+            client = Client(
+                raise_request_exception=False,
+                HTTP_HOST=self.host,
+            )
+            if logged_in:
+                client.force_login(self.manager)
+            clients[logged_in] = client
+        return clients[logged_in]
+
+    def send(self, method, path, body, headers):
+        client = self.get_client(path)
+        headers = {
+            'HTTP_' + name.upper().replace('-', '_'): value
+            for name, value in headers.items()
+        }
+        with CaptureQueriesContext(connections['default']) as queries:
+            if method == 'GET':
+                response = client.get(path, **headers)
+            else:
+                response = client.generic(
+                    method,
+                    path,
+                    json.dumps(body),
+                    content_type='application/json',
+                    **headers,
+                )
+        return response.status_code, len(queries.captured_queries)
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Шлёт запросы на запущенный сервер через пул соединений.
+
+    Сессия менеджера используется только для /manager/: с ней DRF проверял
+    бы CSRF-токен у POST /api/order/ и отклонял заказы.
+    """
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.local = threading.local()
+
+    def get_session(self, path):
+        logged_in = bool(self.username) and is_manager_path(path)
+        sessions = self.local.__dict__.setdefault('sessions', {})
+        if logged_in not in sessions:
+            session = requests.Session()
+            if logged_in:
+                self.login(session)
+            sessions[logged_in] = session
+        return sessions[logged_in]
+
+    def login(self, session):
+        login_url = f'{self.base_url}/manager/login/'
+        session.get(login_url, timeout=10).raise_for_status()
+        session.post(login_url, timeout=10, data={
+            'username': self.username,
+            'password': self.password,
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+        }, headers={'Referer': login_url}).raise_for_status()
+
+    def send(self, method, path, body, headers):
+        response = self.get_session(path).request(
+            method,
+            f'{self.base_url}{path}',
+            json=body if method != 'GET' else None,
+            headers=headers,
+            timeout=30,
+        )
+        return response.status_code, None
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит журнал запросов к API и странице заказов и выводит '
+        'задержки p50/p95/p99, пропускную способность и число SQL-запросов. '
+        'Журнал — JSONL-файл, по строке на запрос: '
+        '{"method": "POST", "path": "/api/order/", "body": {...}, '
+        '"headers": {...}}. Без --base-url запросы идут в Django напрямую.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к JSONL-журналу запросов')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='Сколько раз проиграть журнал',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000',
+        )
+        parser.add_argument(
+            '--host',
+            help='Заголовок Host для запросов без сети, по умолчанию '
+                 'первый из ALLOWED_HOSTS',
+        )
+        parser.add_argument(
+            '--manager',
+            help='Логин менеджера для запросов к /manager/',
+        )
+        parser.add_argument(
+            '--manager-password',
+            help='Пароль менеджера, нужен только вместе с --base-url',
+        )
+
+    def handle(self, *args, **options):
+        entries = self.read_entries(options['path']) * options['repeat']
+        if not entries:
+            raise CommandError('Журнал запросов пуст')
+
+        if options['base_url']:
+            transport = HttpTransport(
+                options['base_url'],
+                options['manager'],
+                options['manager_password'],
+            )
+        else:
+            manager = None
+            if options['manager']:
+                manager = get_user_model().objects.get(
+                    username=options['manager']
+                )
+            host = options['host'] or next(
+                (host for host in settings.ALLOWED_HOSTS
+                 if host not in ('*', '') and not host.startswith('.')),
+                'localhost',
+            )
+            transport = InProcessTransport(host, manager)
+
+        def replay(entry):
+            endpoint = urlsplit(entry['path']).path
+            started_at = time.perf_counter()
+            try:
+                status_code, queries_count = transport.send(
+                    entry.get('method', 'GET').upper(),
+                    entry['path'],
+                    entry.get('body'),
+                    entry.get('headers', {}),
+                )
+            except requests.RequestException:
+                status_code, queries_count = None, None
+            return (
+                endpoint,
+                time.perf_counter() - started_at,
+                status_code,
+                queries_count,
+            )
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(replay, entries))
+        elapsed = time.perf_counter() - started_at
+        transport.close()
+
+        self.print_report(results, elapsed)
+
+    @staticmethod
+    def read_entries(path):
+        with open(path, encoding='utf-8') as log_file:
+            return [json.loads(line) for line in log_file if line.strip()]
+
+    def print_report(self, results, elapsed):
+        endpoints = defaultdict(list)
+        for endpoint, *result in results:
+            endpoints[endpoint].append(result)
+
+        self.stdout.write(
+            'endpoint\trequests\t4xx\terrors\trps\t'
+            'p50, ms\tp95, ms\tp99, ms\tqueries'
+        )
+        for endpoint, endpoint_results in sorted(endpoints.items()):
+            latencies = [latency * 1000 for latency, _, _ in endpoint_results]
+            client_errors = sum(
+                1 for _, status_code, _ in endpoint_results
+                if status_code is not None and 400 <= status_code < 500
+            )
+            errors = sum(
+                1 for _, status_code, _ in endpoint_results
+                if status_code is None or status_code >= 500
+            )
+            queries = [
+                queries_count for _, _, queries_count in endpoint_results
+                if queries_count is not None
+            ]
+            average_queries = (
+                f'{sum(queries) / len(queries):.1f}' if queries else '-'
+            )
+            self.stdout.write(
+                f'{endpoint}\t{len(endpoint_results)}\t{client_errors}\t'
+                f'{errors}\t'
+                f'{len(endpoint_results) / elapsed:.1f}\t'
+                f'{get_percentile(latencies, 50):.1f}\t'
+                f'{get_percentile(latencies, 95):.1f}\t'
+                f'{get_percentile(latencies, 99):.1f}\t'
+                f'{average_queries}'
+            )
+        self.stdout.write(
+            f'Всего: {len(results)} запросов за {elapsed:.2f} с, '
+            f'{len(results) / elapsed:.1f} запросов/с'
+        )
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+BANNERS = [
+    {
+        'title': 'Burger',
+        'image': 'burger.jpg',
+        'text': 'Tasty Burger at your door step',
+    },
+    {
+        'title': 'Spices',
+        'image': 'food.jpg',
+        'text': 'All Cuisines',
+    },
+    {
+        'title': 'New York',
+        'image': 'tasty.jpg',
+        'text': 'Food is incomplete without a tasty dessert',
+    },
+]
+
+
+def fill_banners(apps, schema_editor):
+    # Картинки только указываются: скопировать их из assets/ в хранилище
+    # можно командой copy_banner_images
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    Banner.objects.bulk_create(
+        Banner(
+            title=banner_data['title'],
+            text=banner_data['text'],
+            image=f'banners/{banner_data["image"]}',
+            position=position,
+        )
+        for position, banner_data in enumerate(BANNERS)
+    )
+
+
+def remove_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    Banner.objects.filter(
+        title__in=[banner['title'] for banner in BANNERS]
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0064_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_banners, remove_banners),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.15 on 2026-10-18 15:02
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderProduct = apps.get_model('foodcartapp', 'OrderProduct')
+
+    order_totals = (
+        OrderProduct.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(
+            total_price=Sum(
+                F('price') * F('quantity'),
+                output_field=models.DecimalField(),
+            )
+        )
+        .values('total_price')
+    )
+    Order.objects.update(
+        total_price=Coalesce(
+            Subquery(order_totals, output_field=models.DecimalField()),
+            Value(0),
+            output_field=models.DecimalField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0066_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Сумма заказа'),
+        ),
+        migrations.RunPython(fill_total_price, migrations.RunPython.noop),
+    ]
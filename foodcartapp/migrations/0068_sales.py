@@ -0,0 +1,50 @@
+# Generated by Django 3.2.15 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0067_order_total_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.SmallIntegerField(choices=[(0, 'Час'), (1, 'День')], verbose_name='Период')),
+                ('period_start', models.DateTimeField(verbose_name='Начало периода')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Новый заказ'), (1, 'Готовится'), (2, 'Передан курьеру'), (3, 'Закрыт')], verbose_name='Статус заказов')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Товаров')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='foodcartapp.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'продажи ресторана',
+                'verbose_name_plural': 'продажи ресторанов',
+                'unique_together': {('period', 'period_start', 'restaurant', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.SmallIntegerField(choices=[(0, 'Час'), (1, 'День')], verbose_name='Период')),
+                ('period_start', models.DateTimeField(verbose_name='Начало периода')),
+                ('status', models.SmallIntegerField(choices=[(0, 'Новый заказ'), (1, 'Готовится'), (2, 'Передан курьеру'), (3, 'Закрыт')], verbose_name='Статус заказов')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Товаров')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='foodcartapp.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'продажи товара',
+                'verbose_name_plural': 'продажи товаров',
+                'unique_together': {('period', 'period_start', 'product', 'status')},
+            },
+        ),
+    ]
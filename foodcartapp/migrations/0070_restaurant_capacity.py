@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0069_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Пусто — без ограничений', null=True, verbose_name='Заказов в работе одновременно'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+from places.geohash import encode_geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    restaurants = Restaurant.objects.filter(
+        lat__isnull=False, lon__isnull=False,
+    ).only('lat', 'lon')
+    updated_restaurants = []
+    for restaurant in restaurants:
+        restaurant.geohash = encode_geohash(restaurant.lat, restaurant.lon)
+        updated_restaurants.append(restaurant)
+    Restaurant.objects.bulk_update(updated_restaurants, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0070_restaurant_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, verbose_name='Геохеш'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
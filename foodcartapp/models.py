@@ -4,6 +4,9 @@ from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from places.geohash import GEOHASH_LENGTH
+from places.models import GeohashQuerySet
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -38,6 +41,21 @@ class Restaurant(models.Model):
         blank=True,
         null=True
     )
+    capacity = models.PositiveIntegerField(
+        'Заказов в работе одновременно',
+        help_text='Пусто — без ограничений',
+        blank=True,
+        null=True
+    )
+    geohash = models.CharField(
+        'Геохеш',
+        max_length=GEOHASH_LENGTH,
+        db_index=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = GeohashQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'ресторан'
@@ -146,31 +164,18 @@ class RestaurantMenuItem(models.Model):
 
 class PriceQuerySet(models.QuerySet):
     def get_available_restaurants(self):
-        orders = self.prefetch_related('products')
+        """Заказы с маской ресторанов, где в продаже весь заказ.
 
-        available_menu_items = RestaurantMenuItem.objects.filter(
-            availability=True
-        ).select_related('restaurant', 'product')
+        Маска лежит в `order.restaurants_bitmap`, номер бита — id ресторана.
+        """
+        from .availability import availability_index
 
+        orders = list(self.prefetch_related('products'))
         for order in orders:
-            order.restaurant_distances = []
-            order.restaurants = set()
-
-            for order_item in order.products.all():
-                product_restaurants = [
-                    rest_item.restaurant for rest_item in available_menu_items
-                    if order_item.id == rest_item.product.id
-                ]
-
-                if not order.restaurants:
-                    order.restaurants = set(product_restaurants)
-                order.restaurants &= set(product_restaurants)
-        return orders
-
-    def get_full_price(self):
-        return self.annotate(
-            full_price=Sum(F('products__price')*F('ordered_products__quantity'))
+            order.restaurants_bitmap = availability_index.get_common_bitmap(
+                product.id for product in order.products.all()
             )
+        return orders
 
 
 class Order(models.Model):
@@ -233,6 +238,11 @@ class Order(models.Model):
         verbose_name='Дата/время создания',
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата/время изменения',
+        db_index=True
+    )
     called_at = models.DateTimeField(
         verbose_name='Дата/время звонка',
         db_index=True,
@@ -253,15 +263,52 @@ class Order(models.Model):
         null=True,
         blank=True,
     )
+    total_price = models.DecimalField(
+        verbose_name='Сумма заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[
+            MinValueValidator(0)
+        ]
+    )
     objects = PriceQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(
+                fields=['registered_at', 'id'],
+                name='order_registered_idx',
+            ),
+            models.Index(
+                fields=['status', 'registered_at', 'id'],
+                name='order_status_registered_idx',
+            ),
+            models.Index(
+                fields=['payment_method', 'registered_at', 'id'],
+                name='order_payment_registered_idx',
+            ),
+            models.Index(
+                fields=['cook_restaurant', 'registered_at', 'id'],
+                name='order_cook_registered_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.firstname} - {self.pk}'
 
+    def update_total_price(self):
+        """Пересчитывает сумму заказа по ценам, сохранённым в его составе."""
+        self.total_price = self.ordered_products.aggregate(
+            total_price=Sum(
+                F('price') * F('quantity'),
+                output_field=models.DecimalField(),
+            )
+        )['total_price'] or 0
+        self.save(update_fields=['total_price', 'updated_at'])
+
 
 class OrderProduct(models.Model):
     order = models.ForeignKey(
@@ -297,3 +344,165 @@ class OrderProduct(models.Model):
 
     def __str__(self):
         return f'{self.product} {self.quantity} шт.'
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'Ключ',
+        max_length=255,
+        unique=True,
+    )
+    request_hash = models.CharField(
+        'Хэш запроса',
+        max_length=64,
+    )
+    order = models.ForeignKey(
+        Order,
+        related_name='idempotency_keys',
+        on_delete=models.SET_NULL,
+        verbose_name='Заказ',
+        null=True,
+        blank=True,
+    )
+    response_status = models.PositiveSmallIntegerField(
+        'Код ответа',
+        null=True,
+        blank=True,
+    )
+    response_data = models.JSONField(
+        'Ответ',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'Создан',
+        default=timezone.now,
+    )
+    expires_at = models.DateTimeField(
+        'Истекает',
+        db_index=True,
+    )
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+
+class BannerQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+
+class Banner(models.Model):
+    title = models.CharField(
+        'Заголовок',
+        max_length=50
+    )
+    text = models.CharField(
+        'Текст',
+        max_length=200,
+        blank=True,
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='banners',
+    )
+    position = models.PositiveSmallIntegerField(
+        'Порядок',
+        default=0,
+        db_index=True,
+    )
+    is_active = models.BooleanField(
+        'Показывать',
+        default=True,
+        db_index=True,
+    )
+
+    objects = BannerQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
+SALES_PERIODS = [
+    (0, 'Час'),
+    (1, 'День'),
+]
+
+
+class SalesRollup(models.Model):
+    period = models.SmallIntegerField(
+        'Период',
+        choices=SALES_PERIODS,
+    )
+    period_start = models.DateTimeField(
+        'Начало периода',
+    )
+    status = models.SmallIntegerField(
+        'Статус заказов',
+        choices=Order._meta.get_field('status').choices,
+    )
+    orders_count = models.PositiveIntegerField(
+        'Заказов',
+        default=0,
+    )
+    quantity = models.PositiveIntegerField(
+        'Товаров',
+        default=0,
+    )
+    revenue = models.DecimalField(
+        'Выручка',
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class RestaurantSales(SalesRollup):
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='sales',
+        on_delete=models.CASCADE,
+        verbose_name='Ресторан',
+    )
+
+    class Meta:
+        verbose_name = 'продажи ресторана'
+        verbose_name_plural = 'продажи ресторанов'
+        unique_together = [
+            ['period', 'period_start', 'restaurant', 'status']
+        ]
+
+
+class ProductSales(SalesRollup):
+    product = models.ForeignKey(
+        Product,
+        related_name='sales',
+        on_delete=models.CASCADE,
+        verbose_name='Товар',
+    )
+
+    class Meta:
+        verbose_name = 'продажи товара'
+        verbose_name_plural = 'продажи товаров'
+        unique_together = [
+            ['period', 'period_start', 'product', 'status']
+        ]
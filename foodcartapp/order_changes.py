@@ -0,0 +1,29 @@
+import time
+
+from django.core.cache import cache
+
+
+VERSION_CACHE_KEY = 'foodcartapp:orders_version'
+
+
+def get_orders_version():
+    return cache.get_or_set(VERSION_CACHE_KEY, 0, timeout=None)
+
+
+def bump_orders_version():
+    cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+    return cache.incr(VERSION_CACHE_KEY)
+
+
+def wait_for_orders_change(version, timeout, interval=1):
+    """Ждёт, пока заказы изменятся, не обращаясь к базе.
+
+    Номер версии в кэше растёт после каждого коммита с изменёнными
+    заказами. Возвращает текущую версию — по изменению или по таймауту.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        current_version = get_orders_version()
+        if current_version != version or time.monotonic() >= deadline:
+            return current_version
+        time.sleep(interval)
@@ -0,0 +1,55 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+PRETTY_INDENT = 4
+
+
+def is_pretty_requested(request):
+    """Отформатированный JSON для отладки: ?pretty=1."""
+    return request.GET.get('pretty') in ('1', 'true')
+
+
+def dump_json(data, pretty=False):
+    """Сериализует данные API в байты.
+
+    По умолчанию JSON компактный: без отступов и пробелов после
+    разделителей, чтобы работал быстрый кодировщик на C. Decimal, как и в
+    DRF, превращается в строку, поэтому цены везде выглядят одинаково.
+    """
+    if pretty:
+        dumped_data = json.dumps(
+            data,
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            indent=PRETTY_INDENT,
+        )
+    else:
+        dumped_data = json.dumps(
+            data,
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
+    return dumped_data.encode()
+
+
+def render_json(request, data, status=200):
+    return HttpResponse(
+        dump_json(data, pretty=is_pretty_requested(request)),
+        content_type='application/json',
+        status=status,
+    )
+
+
+class ApiJSONRenderer(JSONRenderer):
+    encoder_class = DjangoJSONEncoder
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        request = renderer_context.get('request')
+        if request is not None and is_pretty_requested(request):
+            return PRETTY_INDENT
+        return super().get_indent(accepted_media_type, renderer_context)
@@ -0,0 +1,151 @@
+from collections import defaultdict, namedtuple
+from math import cos, floor, pi, radians
+from threading import RLock
+
+from django.conf import settings
+from django.core.cache import cache
+
+from places.distance import EARTH_RADIUS_KM, get_distance
+
+from .models import Restaurant
+
+
+VERSION_CACHE_KEY = 'foodcartapp:restaurant_index_version'
+KM_PER_DEGREE = EARTH_RADIUS_KM * pi / 180
+# Геодезическое расстояние бывает чуть короче сферического, поэтому
+# нижняя граница до кольца берётся с запасом
+RING_DISTANCE_MARGIN = 0.99
+
+IndexedRestaurant = namedtuple('IndexedRestaurant', ['id', 'name', 'lat', 'lon'])
+
+
+class RestaurantIndex:
+    """Сетка по координатам ресторанов для поиска ближайших.
+
+    Рестораны раскладываются по ячейкам сетки со стороной
+    RESTAURANT_INDEX_CELL_SIZE градусов. Поиск обходит ячейки кольцами
+    от точки запроса и останавливается, когда ближайшее следующее кольцо
+    дальше k-го найденного ресторана. У каждой ячейки есть битовая маска
+    её ресторанов, поэтому ячейки без подходящих ресторанов пропускаются
+    без расчёта расстояний. Как и индекс наличия, сетка строится при
+    первом обращении и перестраивается по версии в кэше.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._cells = None
+        self._version = None
+
+    def _get_cell(self, lat, lon):
+        cell_size = settings.RESTAURANT_INDEX_CELL_SIZE
+        return floor(lat / cell_size), floor(lon / cell_size)
+
+    def _build(self):
+        cells = defaultdict(lambda: [0, []])
+        restaurants = Restaurant.objects.filter(
+            lat__isnull=False, lon__isnull=False,
+        ).values_list('id', 'name', 'lat', 'lon')
+        for restaurant in restaurants:
+            restaurant = IndexedRestaurant(*restaurant)
+            cell = cells[self._get_cell(restaurant.lat, restaurant.lon)]
+            cell[0] |= 1 << restaurant.id
+            cell[1].append(restaurant)
+        return dict(cells)
+
+    def _get_cells(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        with self._lock:
+            if self._cells is None or self._version != version:
+                self._cells = self._build()
+                self._version = version
+            return self._cells
+
+    def _get_ring_distance(self, lat, ring):
+        """Нижняя граница расстояния до ячеек кольца с номером `ring`."""
+        if ring <= 1:
+            return 0
+        cell_size = settings.RESTAURANT_INDEX_CELL_SIZE
+        farthest_lat = min(abs(lat) + ring * cell_size, 90)
+        return (ring - 1) * cell_size * KM_PER_DEGREE * cos(
+            radians(farthest_lat)
+        ) * RING_DISTANCE_MARGIN
+
+    @staticmethod
+    def _iter_ring(row, column, ring):
+        """Ячейки на границе квадрата со стороной 2 * ring + 1."""
+        if ring == 0:
+            yield row, column
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+    def _iter_cells(self, cells, row, column):
+        """Непустые ячейки с номерами колец, от ближних к дальним.
+
+        Кольца обходятся по смещению от ячейки запроса, пока обойдённых
+        ячеек меньше, чем непустых. Дальше дешевле один раз отсортировать
+        оставшиеся ячейки, чем перебирать пустые кольца.
+        """
+        ring = 0
+        while (2 * ring + 1) ** 2 <= len(cells):
+            for cell in self._iter_ring(row, column, ring):
+                if cell in cells:
+                    yield ring, cell
+            ring += 1
+
+        def get_ring(cell):
+            return max(abs(cell[0] - row), abs(cell[1] - column))
+
+        yield from sorted(
+            (get_ring(cell), cell) for cell in cells if get_ring(cell) >= ring
+        )
+
+    def get_nearest(self, lat, lon, k=None, bitmap=None, method='haversine'):
+        """Ближайшие к точке рестораны с расстояниями в километрах.
+
+        `bitmap` — маска подходящих ресторанов из индекса наличия, без неё
+        подходят все. `method` — как в places.distance.get_distance.
+        Возвращает список пар (ресторан, расстояние), отсортированный
+        по расстоянию, не длиннее `k`.
+        """
+        cells = self._get_cells()
+        row, column = self._get_cell(lat, lon)
+
+        nearest = []
+        for ring, cell in self._iter_cells(cells, row, column):
+            if k is not None and len(nearest) >= k and (
+                self._get_ring_distance(lat, ring) > nearest[-1][1]
+            ):
+                break
+            cell_bitmap, restaurants = cells[cell]
+            if bitmap is not None and not cell_bitmap & bitmap:
+                continue
+            for restaurant in restaurants:
+                if bitmap is not None and not bitmap >> restaurant.id & 1:
+                    continue
+                nearest.append((
+                    restaurant,
+                    get_distance(
+                        lat, lon, restaurant.lat, restaurant.lon, method,
+                    ),
+                ))
+            nearest.sort(key=lambda found: found[1])
+            if k is not None:
+                del nearest[k:]
+        return nearest
+
+    def invalidate(self):
+        cache.add(VERSION_CACHE_KEY, 0, timeout=None)
+        cache.incr(VERSION_CACHE_KEY)
+
+    def reset(self):
+        with self._lock:
+            self._cells = None
+            self.invalidate()
+
+
+restaurant_index = RestaurantIndex()
@@ -0,0 +1,235 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Order, OrderProduct, ProductSales, RestaurantSales
+
+
+HOUR = 0
+DAY = 1
+
+DIMENSION_FIELDS = {
+    RestaurantSales: 'restaurant_id',
+    ProductSales: 'product_id',
+}
+
+
+def get_order_fields(order):
+    """Поля заказа, от которых зависят сводки продаж."""
+    return order.registered_at, order.status, order.cook_restaurant_id
+
+
+def get_order_lines(order):
+    return list(
+        order.ordered_products.values_list('product_id', 'quantity', 'price')
+    )
+
+
+def get_lines(order_products):
+    return [
+        (order_product.product_id, order_product.quantity, order_product.price)
+        for order_product in order_products
+    ]
+
+
+def get_period_starts(registered_at):
+    hour_start = timezone.localtime(registered_at).replace(
+        minute=0, second=0, microsecond=0,
+    )
+    return [
+        (HOUR, hour_start),
+        (DAY, hour_start.replace(hour=0)),
+    ]
+
+
+def new_sales():
+    return defaultdict(lambda: [0, 0, Decimal(0)])
+
+
+def add_order_sales(sales, order_fields, lines, sign=1):
+    """Добавляет вклад заказа в сводку вида ключ -> [заказов, товаров, выручка].
+
+    Ключ — (модель сводки, период, начало периода, статус, id ресторана
+    или товара). Заказы без ресторана в сводку по ресторанам не попадают.
+    """
+    registered_at, status, restaurant_id = order_fields
+    for period, period_start in get_period_starts(registered_at):
+        if restaurant_id is not None:
+            row = sales[
+                (RestaurantSales, period, period_start, status, restaurant_id)
+            ]
+            row[0] += sign
+            for _, quantity, price in lines:
+                row[1] += sign * quantity
+                row[2] += sign * price * quantity
+
+        for product_id in {product_id for product_id, _, _ in lines}:
+            sales[
+                (ProductSales, period, period_start, status, product_id)
+            ][0] += sign
+        for product_id, quantity, price in lines:
+            row = sales[
+                (ProductSales, period, period_start, status, product_id)
+            ]
+            row[1] += sign * quantity
+            row[2] += sign * price * quantity
+    return sales
+
+
+def get_rollup_lookup(model, key):
+    period, period_start, status, dimension_id = key
+    return {
+        'period': period,
+        'period_start': period_start,
+        'status': status,
+        DIMENSION_FIELDS[model]: dimension_id,
+    }
+
+
+def find_rollup_rows(model, keys):
+    """Строки сводки по ключам (период, начало, статус, id) одним запросом."""
+    dimension_field = DIMENSION_FIELDS[model]
+    periods, period_starts, statuses, dimension_ids = (
+        set(values) for values in zip(*keys)
+    )
+    found_rows = model.objects.filter(
+        period__in=periods,
+        period_start__in=period_starts,
+        status__in=statuses,
+        **{f'{dimension_field}__in': dimension_ids}
+    )
+    keys = set(keys)
+    rows = {}
+    for row in found_rows:
+        key = (
+            row.period,
+            row.period_start,
+            row.status,
+            getattr(row, dimension_field),
+        )
+        if key in keys:
+            rows[key] = row
+    return rows
+
+
+def save_sales_delta(sales):
+    """Прибавляет изменения к строкам сводок, создавая недостающие.
+
+    Число запросов не зависит от того, сколько строк затронуто: на каждую
+    модель сводки строки ищутся одним запросом, недостающие создаются
+    пустыми одним INSERT и прибавляются вместе с остальными через
+    bulk_update с F-выражениями, поэтому параллельные заказы не теряют
+    изменений друг друга.
+    """
+    deltas = defaultdict(dict)
+    for (model, *key), delta in sales.items():
+        if any(delta):
+            deltas[model][tuple(key)] = delta
+
+    for model, model_deltas in deltas.items():
+        rows = find_rollup_rows(model, model_deltas)
+        missing_keys = [
+            key for key, delta in model_deltas.items()
+            if key not in rows and min(delta) >= 0
+        ]
+        if missing_keys:
+            model.objects.bulk_create(
+                [
+                    model(**get_rollup_lookup(model, key))
+                    for key in missing_keys
+                ],
+                ignore_conflicts=True,
+            )
+            rows.update(find_rollup_rows(model, missing_keys))
+
+        for key in set(model_deltas) - set(rows):
+            # Вычитать не из чего: заказ не попадал в сводку
+            del model_deltas[key]
+        for key, (orders_count, quantity, revenue) in model_deltas.items():
+            row = rows[key]
+            row.orders_count = F('orders_count') + orders_count
+            row.quantity = F('quantity') + quantity
+            row.revenue = F('revenue') + revenue
+        model.objects.bulk_update(
+            [rows[key] for key in model_deltas],
+            ['orders_count', 'quantity', 'revenue'],
+            batch_size=500,
+        )
+
+
+def record_new_orders(orders_with_lines):
+    """Учитывает в сводках новые заказы с составом [(товар, кол-во, цена)]."""
+    sales = new_sales()
+    for order, lines in orders_with_lines:
+        add_order_sales(sales, get_order_fields(order), lines)
+    save_sales_delta(sales)
+
+
+def record_order_change(old_fields, old_lines, new_fields, new_lines):
+    sales = new_sales()
+    if old_fields is not None:
+        add_order_sales(sales, old_fields, old_lines, sign=-1)
+    if new_fields is not None:
+        add_order_sales(sales, new_fields, new_lines)
+    save_sales_delta(sales)
+
+
+def record_orders_changes(changes):
+    """Учитывает пачку изменений вида (старые поля, новые поля, состав)."""
+    sales = new_sales()
+    for old_fields, new_fields, lines in changes:
+        add_order_sales(sales, old_fields, lines, sign=-1)
+        add_order_sales(sales, new_fields, lines)
+    save_sales_delta(sales)
+
+
+def iter_orders_with_lines(chunk_size=2000):
+    orders = Order.objects.order_by('id').values_list(
+        'id', 'registered_at', 'status', 'cook_restaurant_id',
+    )
+    last_id = 0
+    while True:
+        orders_chunk = list(orders.filter(id__gt=last_id)[:chunk_size])
+        if not orders_chunk:
+            return
+        last_id = orders_chunk[-1][0]
+
+        lines = defaultdict(list)
+        order_products = OrderProduct.objects.filter(
+            order_id__gte=orders_chunk[0][0],
+            order_id__lte=last_id,
+        ).values_list('order_id', 'product_id', 'quantity', 'price')
+        for order_id, product_id, quantity, price in order_products:
+            lines[order_id].append((product_id, quantity, price))
+
+        for order_id, *order_fields in orders_chunk:
+            yield order_fields, lines[order_id]
+
+
+@transaction.atomic
+def rebuild_sales():
+    """Пересчитывает сводки продаж с нуля по всем заказам."""
+    sales = new_sales()
+    for order_fields, lines in iter_orders_with_lines():
+        add_order_sales(sales, order_fields, lines)
+
+    rows = defaultdict(list)
+    for key, (orders_count, quantity, revenue) in sales.items():
+        model, period, period_start, status, dimension_id = key
+        rows[model].append(model(
+            period=period,
+            period_start=period_start,
+            status=status,
+            orders_count=orders_count,
+            quantity=quantity,
+            revenue=revenue,
+            **{DIMENSION_FIELDS[model]: dimension_id}
+        ))
+
+    for model in DIMENSION_FIELDS:
+        model.objects.all().delete()
+        model.objects.bulk_create(rows[model], batch_size=1000)
+    return {model: len(rows[model]) for model in DIMENSION_FIELDS}
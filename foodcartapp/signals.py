@@ -0,0 +1,149 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from places.geohash import encode_geohash
+from places.get_place import get_place
+
+from .availability import availability_index
+from .models import (Banner, Order, OrderProduct, Product, ProductCategory,
+                     Restaurant, RestaurantMenuItem)
+from .order_changes import bump_orders_version
+from .restaurant_index import restaurant_index
+from .sales import get_order_fields, get_order_lines, record_order_change
+from .snapshots import banners_snapshot, products_snapshot
+
+
+@receiver(post_init, sender=RestaurantMenuItem)
+def remember_menu_item_key(sender, instance, **kwargs):
+    instance._initial_availability_key = (
+        instance.product_id,
+        instance.restaurant_id,
+    )
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+def update_availability_on_save(sender, instance, **kwargs):
+    initial_key = instance._initial_availability_key
+    current_key = (instance.product_id, instance.restaurant_id)
+    instance._initial_availability_key = current_key
+
+    def update_index():
+        if initial_key != current_key and None not in initial_key:
+            availability_index.set_availability(*initial_key, False)
+        availability_index.set_availability(
+            *current_key, instance.availability
+        )
+
+    transaction.on_commit(update_index)
+
+
+@receiver(post_delete, sender=RestaurantMenuItem)
+def update_availability_on_delete(sender, instance, **kwargs):
+    key = (instance.product_id, instance.restaurant_id)
+    transaction.on_commit(
+        lambda: availability_index.set_availability(*key, False)
+    )
+
+
+@receiver(post_init, sender=Restaurant)
+def remember_restaurant_location(sender, instance, **kwargs):
+    instance._initial_location = (
+        instance.address,
+        instance.lon,
+        instance.lat,
+    )
+
+
+@receiver(pre_save, sender=Restaurant)
+def geocode_restaurant(sender, instance, **kwargs):
+    initial_address, initial_lon, initial_lat = instance._initial_location
+    address_changed = instance.address != initial_address
+    coordinates_changed = (instance.lon, instance.lat) != (
+        initial_lon, initial_lat
+    )
+    coordinates_missing = instance.lon is None or instance.lat is None
+
+    if not address_changed and not coordinates_missing:
+        return
+    if coordinates_changed and not coordinates_missing:
+        # Координаты поправили вручную вместе с адресом
+        return
+
+    instance.lon = instance.lat = None
+    if not instance.address:
+        return
+    place = get_place(instance.address)
+    if place:
+        instance.lon, instance.lat = place.lon, place.lat
+
+
+@receiver(pre_save, sender=Restaurant)
+def update_restaurant_geohash(sender, instance, **kwargs):
+    # Подключён после geocode_restaurant, поэтому видит новые координаты
+    instance.geohash = encode_geohash(instance.lat, instance.lon)
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_location(sender, instance, **kwargs):
+    instance._initial_location = (
+        instance.address,
+        instance.lon,
+        instance.lat,
+    )
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant_index(sender, **kwargs):
+    transaction.on_commit(restaurant_index.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_products_snapshot(sender, **kwargs):
+    transaction.on_commit(products_snapshot.invalidate)
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners_snapshot(sender, **kwargs):
+    transaction.on_commit(banners_snapshot.invalidate)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_sales_fields(sender, instance, **kwargs):
+    instance._initial_sales_fields = get_order_fields(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_on_order_change(sender, instance, created, **kwargs):
+    initial_fields = instance._initial_sales_fields
+    current_fields = get_order_fields(instance)
+    instance._initial_sales_fields = current_fields
+
+    # Новые заказы учитываются вместе с составом там, где его сохраняют
+    if created or initial_fields == current_fields:
+        return
+    lines = get_order_lines(instance)
+    record_order_change(initial_fields, lines, current_fields, lines)
+
+
+@receiver(pre_delete, sender=Order)
+def update_sales_on_order_delete(sender, instance, **kwargs):
+    record_order_change(
+        instance._initial_sales_fields, get_order_lines(instance), None, [],
+    )
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderProduct)
+@receiver(post_delete, sender=OrderProduct)
+def notify_orders_changed(sender, **kwargs):
+    transaction.on_commit(bump_orders_version)
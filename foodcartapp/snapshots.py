@@ -0,0 +1,108 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+
+from .models import Banner, Product
+from .renderers import dump_json, is_pretty_requested, render_json
+
+
+Snapshot = namedtuple('Snapshot', ['body', 'etag'])
+
+
+class CachedSnapshot:
+    """Готовый компактный JSON-ответ API, общий для всех процессов через кэш.
+
+    Ключ снимка включает номер версии. Чтобы сбросить снимок, достаточно
+    увеличить версию: старые записи сами истекут по таймауту. Процессы
+    видят новую версию, только если основной кэш у них общий (CACHE_URL).
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.version_key = f'foodcartapp:snapshot:{name}:version'
+
+    def get(self):
+        version = cache.get_or_set(self.version_key, 1, timeout=None)
+        snapshot_key = f'foodcartapp:snapshot:{self.name}:{version}'
+        snapshot = cache.get(snapshot_key)
+        if snapshot is None:
+            body = dump_json(self.build())
+            etag = '"{}"'.format(hashlib.sha256(body).hexdigest())
+            snapshot = Snapshot(body, etag)
+            cache.set(
+                snapshot_key,
+                snapshot,
+                timeout=settings.API_SNAPSHOT_CACHE_TTL,
+            )
+        return snapshot
+
+    def get_etag(self, request, *args, **kwargs):
+        if is_pretty_requested(request):
+            return None
+        return self.get().etag
+
+    def render(self, request):
+        """Ответ со снимком. С ?pretty=1 JSON переформатируется без ETag."""
+        snapshot = self.get()
+        if is_pretty_requested(request):
+            return render_json(request, json.loads(snapshot.body))
+
+        response = HttpResponse(
+            snapshot.body,
+            content_type='application/json',
+        )
+        response['ETag'] = snapshot.etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def invalidate(self):
+        cache.add(self.version_key, 1, timeout=None)
+        cache.incr(self.version_key)
+
+
+def serialize_products():
+    products = Product.objects.select_related('category').available()
+
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            }
+        }
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+products_snapshot = CachedSnapshot('products', serialize_products)
+
+
+def serialize_banners():
+    return [
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in Banner.objects.active()
+    ]
+
+
+banners_snapshot = CachedSnapshot('banners', serialize_banners)
@@ -0,0 +1,772 @@
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from places.distance import get_distance
+from places.geocoders import FakeGeocoder
+from places.geohash import encode_geohash
+from places.models import GeocodingTask
+from places.tests import RecordingGeocoder
+
+from .availability import (AvailabilityIndex, availability_index,
+                           iter_restaurant_ids)
+from .management.commands.bench_available_restaurants import (
+    Command as BenchAvailableRestaurantsCommand,
+    legacy_available_restaurants,
+)
+from .models import (Banner, IdempotencyKey, Order, Product,
+                     ProductCategory, ProductSales, Restaurant,
+                     RestaurantMenuItem)
+from .renderers import dump_json
+from .restaurant_index import restaurant_index
+from .sales import rebuild_sales
+from .snapshots import banners_snapshot, products_snapshot
+
+
+class OrderApiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {number}', price=100, image='burger.jpg'
+            )
+            for number in range(21)
+        ]
+
+    def get_order_data(self, products):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79161234567',
+            'address': 'Москва, Тверская, 7',
+            'products': [
+                {'product': product.id, 'quantity': 2}
+                for product in products
+            ],
+        }
+
+    def post_order(self, data, **headers):
+        return self.client.post(
+            '/api/order/', data, content_type='application/json', **headers
+        )
+
+
+class RegisterOrderTest(OrderApiTestCase):
+    def test_queries_do_not_depend_on_cart_size(self):
+        with CaptureQueriesContext(connection) as small_cart_queries:
+            response = self.post_order(self.get_order_data(self.products[:1]))
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(len(small_cart_queries)):
+            response = self.post_order(self.get_order_data(self.products[1:]))
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.latest('id')
+        self.assertEqual(order.ordered_products.count(), 20)
+        self.assertEqual(order.total_price, 20 * 2 * 100)
+
+
+class IdempotencyKeyTest(OrderApiTestCase):
+    def test_replays_saved_response(self):
+        data = self.get_order_data(self.products[:2])
+
+        first_response = self.post_order(data, HTTP_IDEMPOTENCY_KEY='key')
+        second_response = self.post_order(data, HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(second_response.json(), first_response.json())
+        self.assertEqual(second_response['Idempotent-Replayed'], 'true')
+        self.assertFalse(first_response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_rejects_same_key_with_other_body(self):
+        self.post_order(
+            self.get_order_data(self.products[:1]), HTTP_IDEMPOTENCY_KEY='key'
+        )
+
+        response = self.post_order(
+            self.get_order_data(self.products[:2]), HTTP_IDEMPOTENCY_KEY='key'
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_key_can_be_reused(self):
+        self.post_order(
+            self.get_order_data(self.products[:1]), HTTP_IDEMPOTENCY_KEY='key'
+        )
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = self.post_order(
+            self.get_order_data(self.products[:2]), HTTP_IDEMPOTENCY_KEY='key'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_validation_error_does_not_keep_key(self):
+        invalid_data = self.get_order_data([])
+
+        response = self.post_order(invalid_data, HTTP_IDEMPOTENCY_KEY='key')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post_order(
+            self.get_order_data(self.products[:1]), HTTP_IDEMPOTENCY_KEY='key'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_rejects_too_long_key(self):
+        response = self.post_order(
+            self.get_order_data(self.products[:1]),
+            HTTP_IDEMPOTENCY_KEY='k' * 256,
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+        response = self.post_order(
+            self.get_order_data(self.products[:1]),
+            HTTP_IDEMPOTENCY_KEY='k' * 255,
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class BannersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Миграции добавляют стартовые баннеры
+        Banner.objects.all().delete()
+        cls.banners = [
+            Banner.objects.create(
+                title=f'Баннер {number}',
+                image=f'banners/{number}.jpg',
+                position=position,
+            )
+            for number, position in enumerate([2, 1, 1])
+        ]
+
+    def setUp(self):
+        banners_snapshot.invalidate()
+
+    def get_titles(self):
+        response = self.client.get('/api/banners/')
+        self.assertEqual(response.status_code, 200)
+        return [banner['title'] for banner in response.json()]
+
+    def test_active_banners_ordered_by_position(self):
+        self.banners[1].is_active = False
+        self.banners[1].save()
+
+        self.assertEqual(
+            list(Banner.objects.active()),
+            [self.banners[2], self.banners[0]],
+        )
+
+    def test_lists_active_banners(self):
+        response = self.client.get('/api/banners/')
+
+        self.assertEqual(response.json()[0], {
+            'title': 'Баннер 1',
+            'src': '/media/banners/1.jpg',
+            'text': '',
+        })
+        self.assertEqual(
+            [banner['title'] for banner in response.json()],
+            ['Баннер 1', 'Баннер 2', 'Баннер 0'],
+        )
+
+    def test_banner_changes_invalidate(self):
+        first_banner, second_banner, _ = self.banners
+        self.assertEqual(
+            self.get_titles(), ['Баннер 1', 'Баннер 2', 'Баннер 0']
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second_banner.is_active = False
+            second_banner.save()
+        self.assertEqual(self.get_titles(), ['Баннер 2', 'Баннер 0'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first_banner.position = 0
+            first_banner.save()
+        self.assertEqual(self.get_titles(), ['Баннер 0', 'Баннер 2'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second_banner.is_active = True
+            second_banner.save()
+        self.assertEqual(
+            self.get_titles(), ['Баннер 0', 'Баннер 1', 'Баннер 2']
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first_banner.delete()
+        self.assertEqual(self.get_titles(), ['Баннер 1', 'Баннер 2'])
+
+
+class JsonFormattingTest(OrderApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        restaurant = Restaurant.objects.create(name='Ресторан')
+        RestaurantMenuItem.objects.create(
+            restaurant=restaurant, product=cls.products[0],
+        )
+
+    def setUp(self):
+        products_snapshot.invalidate()
+
+    def assert_compact(self, response):
+        self.assertEqual(
+            response.content,
+            json.dumps(
+                response.json(), ensure_ascii=False, separators=(',', ':'),
+            ).encode(),
+        )
+
+    def assert_pretty(self, response):
+        content = response.content.decode()
+        self.assertTrue(content.startswith(('[\n    ', '{\n    ')))
+        self.assertEqual(json.loads(content), response.json())
+
+    def test_order_is_compact_by_default(self):
+        response = self.post_order(self.get_order_data(self.products[:1]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Иван', response.content.decode())
+        self.assert_compact(response)
+
+    def test_pretty_order(self):
+        data = self.get_order_data(self.products[:1])
+        response = self.client.post(
+            '/api/order/?pretty=1', data, content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assert_pretty(response)
+        self.assertEqual(response.json()['firstname'], 'Иван')
+
+    def test_snapshot_is_compact_by_default(self):
+        response = self.client.get('/api/products/')
+
+        self.assertEqual(response.content, dump_json(response.json()))
+        self.assert_compact(response)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_pretty_snapshot_has_no_etag(self):
+        compact_response = self.client.get('/api/products/')
+
+        for pretty in ['1', 'true']:
+            response = self.client.get(
+                '/api/products/', {'pretty': pretty},
+                HTTP_IF_NONE_MATCH=compact_response['ETag'],
+            )
+
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertEqual(
+                response.content,
+                dump_json(compact_response.json(), pretty=True),
+            )
+            self.assert_pretty(response)
+
+
+class ImportOrdersTest(OrderApiTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.orders_path = os.path.join(directory.name, 'orders.jsonl')
+        self.rejected_path = os.path.join(directory.name, 'rejected.jsonl')
+
+        orders = [
+            self.get_order_data(self.products[:2]),
+            self.get_order_data(self.products[1:2]),
+            '{"firstname": ',
+            self.get_order_data([]),
+            self.get_order_data(self.products[2:5]),
+            '',
+            self.get_order_data(self.products[:1]),
+        ]
+        orders[4]['address'] = 'Москва, Арбат, 1'
+        with open(self.orders_path, 'w', encoding='utf-8') as orders_file:
+            for order in orders:
+                if not isinstance(order, str):
+                    order = json.dumps(order, ensure_ascii=False)
+                orders_file.write(order + '\n')
+
+    def import_orders(self):
+        stdout = StringIO()
+        call_command(
+            'import_orders', self.orders_path,
+            batch_size=3, rejected=self.rejected_path, stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def get_sales(self):
+        return sorted(
+            ProductSales.objects.exclude(orders_count=0).values_list(
+                'product', 'period', 'period_start', 'status',
+                'orders_count', 'quantity', 'revenue',
+            )
+        )
+
+    def assert_imported(self, stdout):
+        # По строке прогресса на каждую пачку из трёх строк файла
+        progress_lines = [
+            line for line in stdout.splitlines() if line.endswith('строк/с')
+        ]
+        self.assertEqual(
+            [line.split(', ')[:2] for line in progress_lines],
+            [
+                ['Загружено: 2', 'отклонено: 1'],
+                ['Загружено: 3', 'отклонено: 2'],
+                ['Загружено: 4', 'отклонено: 2'],
+            ],
+        )
+        self.assertIn(self.rejected_path, stdout)
+
+        with open(self.rejected_path, encoding='utf-8') as rejected_file:
+            rejected_lines = [json.loads(line) for line in rejected_file]
+        self.assertEqual(
+            [rejected_line['line'] for rejected_line in rejected_lines],
+            [3, 4],
+        )
+        self.assertIn('products', rejected_lines[1]['errors'])
+
+        orders = Order.objects.order_by('id').prefetch_related(
+            'ordered_products'
+        )
+        self.assertEqual(
+            [order.total_price for order in orders], [400, 200, 600, 200]
+        )
+        self.assertEqual(
+            [order.ordered_products.count() for order in orders],
+            [2, 1, 3, 1],
+        )
+        self.assertEqual(
+            set(GeocodingTask.objects.values_list('address', flat=True)),
+            {'Москва, Тверская, 7', 'Москва, Арбат, 1'},
+        )
+
+        imported_sales = self.get_sales()
+        self.assertEqual(
+            sum(sales[5] for sales in imported_sales if sales[1] == 0), 14
+        )
+        rebuild_sales()
+        self.assertEqual(imported_sales, self.get_sales())
+
+    def test_imports_orders_in_batches(self):
+        self.assert_imported(self.import_orders())
+
+    def test_saves_orders_one_by_one_without_bulk_returning(self):
+        with mock.patch.object(
+            connection.features, 'can_return_rows_from_bulk_insert', False,
+        ), CaptureQueriesContext(connection) as queries:
+            stdout = self.import_orders()
+
+        order_inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "foodcartapp_order"')
+        ]
+        self.assertEqual(len(order_inserts), 4)
+        self.assert_imported(stdout)
+
+
+class AvailabilitySignalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = [
+            Restaurant.objects.create(name=f'Ресторан {number}')
+            for number in range(2)
+        ]
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {number}', price=100, image='burger.jpg'
+            )
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        availability_index.reset()
+        # Индекс другого процесса узнаёт об изменениях по версии в кэше
+        self.other_process_index = AvailabilityIndex()
+
+    def assert_index_in_sync(self):
+        expected_bitmaps = {
+            product.id: availability_index._build().get(product.id, 0)
+            for product in self.products
+        }
+        for index in [availability_index, self.other_process_index]:
+            self.assertEqual(
+                {
+                    product.id: index.get_bitmap(product.id)
+                    for product in self.products
+                },
+                expected_bitmaps,
+            )
+
+    def test_menu_changes_update_bitmaps(self):
+        first_product, second_product = self.products
+        self.assert_index_in_sync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item = RestaurantMenuItem.objects.create(
+                restaurant=self.restaurants[0], product=first_product,
+            )
+        self.assertTrue(availability_index.is_available(
+            first_product.id, self.restaurants[0].id
+        ))
+        self.assert_index_in_sync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.availability = False
+            menu_item.save()
+        self.assert_index_in_sync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.availability = True
+            menu_item.product = second_product
+            menu_item.save()
+        self.assertFalse(availability_index.is_available(
+            first_product.id, self.restaurants[0].id
+        ))
+        self.assert_index_in_sync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.delete()
+        self.assertEqual(availability_index.get_bitmap(second_product.id), 0)
+        self.assert_index_in_sync()
+
+
+class AvailableRestaurantsTest(TestCase):
+    def test_matches_legacy_loop(self):
+        random.seed(0)
+        BenchAvailableRestaurantsCommand.populate(
+            orders_count=60,
+            restaurants_count=6,
+            products_count=10,
+            items_per_order=3,
+        )
+        availability_index.reset()
+        orders = Order.objects.order_by('id').prefetch_related('products')
+
+        legacy_orders = legacy_available_restaurants(orders)
+        indexed_orders = orders.get_available_restaurants()
+
+        menu = {
+            (menu_item.product_id, menu_item.restaurant_id)
+            for menu_item in RestaurantMenuItem.objects.filter(
+                availability=True
+            )
+        }
+        restaurant_ids = set(Restaurant.objects.values_list('id', flat=True))
+        for legacy_order, indexed_order in zip(legacy_orders, indexed_orders):
+            expected_ids = {
+                restaurant_id for restaurant_id in restaurant_ids
+                if all(
+                    (product.id, restaurant_id) in menu
+                    for product in legacy_order.products.all()
+                )
+            }
+            self.assertEqual(
+                set(iter_restaurant_ids(indexed_order.restaurants_bitmap)),
+                expected_ids,
+            )
+            # Старый цикл начинал пересечение заново, когда оно пустело,
+            # поэтому совпадает с новым, только если подходящие есть
+            if expected_ids:
+                self.assertEqual(
+                    {restaurant.id for restaurant in legacy_order.restaurants},
+                    expected_ids,
+                )
+
+
+@override_settings(RESTAURANT_INDEX_CELL_SIZE=0.01)
+class RestaurantIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        random_generator = random.Random(0)
+        for number in range(60):
+            Restaurant.objects.create(
+                name=f'Ресторан {number}',
+                lat=55.55 + random_generator.random() * 0.4,
+                lon=37.35 + random_generator.random() * 0.5,
+            )
+        cls.restaurants = list(Restaurant.objects.all())
+
+    def setUp(self):
+        restaurant_index.reset()
+
+    def get_expected_nearest(self, lat, lon, k, bitmap, method):
+        distances = sorted(
+            (get_distance(lat, lon, rest.lat, rest.lon, method), rest.id)
+            for rest in self.restaurants
+            if bitmap >> rest.id & 1
+        )
+        return [
+            (restaurant_id, round(rest_distance, 6))
+            for rest_distance, restaurant_id in distances[:k]
+        ]
+
+    def test_matches_full_scan(self):
+        random_generator = random.Random(1)
+        bitmap = sum(
+            1 << rest.id for rest in self.restaurants
+            if random_generator.random() < 0.3
+        )
+        for lat, lon in [(55.75, 37.62), (55.5, 37.3), (56.5, 38.5)]:
+            for method in ['haversine', 'geodesic']:
+                nearest = restaurant_index.get_nearest(
+                    lat, lon, k=5, bitmap=bitmap, method=method,
+                )
+
+                self.assertEqual(
+                    [(rest.id, round(rest_distance, 6))
+                     for rest, rest_distance in nearest],
+                    self.get_expected_nearest(lat, lon, 5, bitmap, method),
+                )
+
+
+class ProductsSnapshotTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name='Ресторан')
+        cls.category = ProductCategory.objects.create(name='Бургеры')
+        cls.product = Product.objects.create(
+            name='Чизбургер', price=100, image='burger.jpg',
+            category=cls.category,
+        )
+        cls.menu_item = RestaurantMenuItem.objects.create(
+            restaurant=cls.restaurant, product=cls.product,
+        )
+
+    def setUp(self):
+        products_snapshot.invalidate()
+
+    def get_products(self, **headers):
+        return self.client.get('/api/products/', **headers)
+
+    def assert_changes_snapshot(self, change):
+        etag = self.get_products()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.get_products(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response.json()
+
+    def test_strong_etag(self):
+        response = self.get_products()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{64}"$')
+        self.assertEqual(self.get_products()['ETag'], response['ETag'])
+        self.assertEqual(
+            [product['name'] for product in response.json()], ['Чизбургер']
+        )
+
+    def test_not_modified(self):
+        etag = self.get_products()['ETag']
+
+        response = self.get_products(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_product_changes_invalidate(self):
+        def rename_product():
+            self.product.name = 'Гамбургер'
+            self.product.save()
+
+        products = self.assert_changes_snapshot(rename_product)
+        self.assertEqual(products[0]['name'], 'Гамбургер')
+
+        products = self.assert_changes_snapshot(self.product.delete)
+        self.assertEqual(products, [])
+
+    def test_category_changes_invalidate(self):
+        def rename_category():
+            self.category.name = 'Роллы'
+            self.category.save()
+
+        products = self.assert_changes_snapshot(rename_category)
+        self.assertEqual(products[0]['category']['name'], 'Роллы')
+
+        products = self.assert_changes_snapshot(self.category.delete)
+        self.assertIsNone(products[0]['category'])
+
+    def test_menu_item_changes_invalidate(self):
+        def hide_menu_item():
+            self.menu_item.availability = False
+            self.menu_item.save()
+
+        products = self.assert_changes_snapshot(hide_menu_item)
+        self.assertEqual(products, [])
+
+        def show_menu_item():
+            self.menu_item.availability = True
+            self.menu_item.save()
+
+        products = self.assert_changes_snapshot(show_menu_item)
+        self.assertEqual(len(products), 1)
+
+        products = self.assert_changes_snapshot(self.menu_item.delete)
+        self.assertEqual(products, [])
+
+
+@override_settings(GEOCODER_BACKEND='places.tests.RecordingGeocoder')
+class RestaurantGeocodingTest(TestCase):
+    def setUp(self):
+        RecordingGeocoder.requested_addresses = []
+
+    def assert_located_at(self, restaurant, address):
+        restaurant.refresh_from_db()
+        lon, lat = FakeGeocoder().geocode(address)
+        self.assertEqual((restaurant.lon, restaurant.lat), (lon, lat))
+        self.assertEqual(restaurant.geohash, encode_geohash(lat, lon))
+
+    def test_geocodes_new_and_changed_address(self):
+        restaurant = Restaurant.objects.create(
+            name='Ресторан', address='Москва, Тверская, 7',
+        )
+        self.assert_located_at(restaurant, 'Москва, Тверская, 7')
+
+        restaurant.address = 'Москва, Арбат, 1'
+        restaurant.save()
+
+        self.assert_located_at(restaurant, 'Москва, Арбат, 1')
+        self.assertEqual(
+            RecordingGeocoder.requested_addresses,
+            ['Москва, Тверская, 7', 'Москва, Арбат, 1'],
+        )
+
+    def test_keeps_coordinates_edited_by_hand(self):
+        restaurant = Restaurant.objects.create(
+            name='Ресторан', address='Москва, Тверская, 7',
+        )
+        RecordingGeocoder.requested_addresses = []
+
+        restaurant.lon, restaurant.lat = 37.5, 55.5
+        restaurant.save()
+        restaurant.address = 'Москва, Арбат, 1'
+        restaurant.lon, restaurant.lat = 37.6, 55.6
+        restaurant.save()
+
+        restaurant.refresh_from_db()
+        self.assertEqual((restaurant.lon, restaurant.lat), (37.6, 55.6))
+        self.assertEqual(restaurant.geohash, encode_geohash(55.6, 37.6))
+        self.assertEqual(RecordingGeocoder.requested_addresses, [])
+
+    def test_geocodes_again_when_coordinates_cleared(self):
+        restaurant = Restaurant.objects.create(
+            name='Ресторан', address='Москва, Тверская, 7',
+            lon=37.5, lat=55.5,
+        )
+        self.assertEqual(RecordingGeocoder.requested_addresses, [])
+
+        restaurant.lon = restaurant.lat = None
+        restaurant.save()
+
+        self.assert_located_at(restaurant, 'Москва, Тверская, 7')
+
+    @override_settings(GEOCODER_BACKEND='places.tests.OfflineGeocoder')
+    def test_saves_without_coordinates_when_geocoder_unavailable(self):
+        restaurant = Restaurant.objects.create(
+            name='Ресторан', address='Москва, Тверская, 7',
+        )
+
+        restaurant.refresh_from_db()
+        self.assertIsNone(restaurant.lon)
+        self.assertIsNone(restaurant.lat)
+        self.assertEqual(restaurant.geohash, '')
+
+
+@override_settings(GEOCODER_BACKEND='places.tests.RecordingGeocoder')
+class GeocodeRestaurantsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.located_restaurant = Restaurant.objects.create(
+            name='С координатами', address='Москва, Арбат, 1',
+            lon=37.5, lat=55.5,
+        )
+        cls.new_restaurant = Restaurant.objects.create(name='Без координат')
+        Restaurant.objects.create(name='Без адреса')
+        # Адрес без координат, минуя сигнал геокодирования
+        Restaurant.objects.filter(pk=cls.new_restaurant.pk).update(
+            address='Москва, Тверская, 7',
+        )
+
+    def setUp(self):
+        RecordingGeocoder.requested_addresses = []
+        restaurant_index.reset()
+
+    def call_command(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'geocode_restaurants', *args, stdout=stdout, stderr=stderr,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def get_coordinates(self, restaurant):
+        restaurant.refresh_from_db()
+        return restaurant.lon, restaurant.lat
+
+    def test_fills_missing_coordinates(self):
+        stdout, stderr = self.call_command()
+
+        self.assertIn('Обновлено ресторанов: 1 из 1', stdout)
+        self.assertEqual(stderr, '')
+        self.assertEqual(
+            self.get_coordinates(self.new_restaurant),
+            FakeGeocoder().geocode('Москва, Тверская, 7'),
+        )
+        self.assertEqual(
+            self.get_coordinates(self.located_restaurant), (37.5, 55.5)
+        )
+        self.assertEqual(
+            RecordingGeocoder.requested_addresses, ['Москва, Тверская, 7']
+        )
+
+    def test_all_recomputes_every_address(self):
+        restaurant_index.get_nearest(55.5, 37.5, k=1)
+
+        stdout, _ = self.call_command('--all')
+
+        self.assertIn('Обновлено ресторанов: 2 из 2', stdout)
+        lon, lat = FakeGeocoder().geocode('Москва, Арбат, 1')
+        self.assertEqual(
+            self.get_coordinates(self.located_restaurant), (lon, lat)
+        )
+        # Индекс ресторанов сброшен и видит новые координаты
+        (nearest_restaurant, nearest_distance), = restaurant_index.get_nearest(
+            lat, lon, k=1,
+        )
+        self.assertEqual(nearest_restaurant.id, self.located_restaurant.id)
+        self.assertAlmostEqual(nearest_distance, 0)
+
+    @override_settings(GEOCODER_BACKEND='places.tests.OfflineGeocoder')
+    def test_reports_addresses_when_geocoder_unavailable(self):
+        stdout, stderr = self.call_command()
+
+        self.assertIn('Обновлено ресторанов: 0 из 1', stdout)
+        self.assertIn('Не удалось найти адрес: Без координат', stderr)
+        self.assertEqual(
+            self.get_coordinates(self.new_restaurant), (None, None)
+        )
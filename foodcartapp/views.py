@@ -1,67 +1,34 @@
 from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
 from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        Serializer, ValidationError)
+                                        PrimaryKeyRelatedField,
+                                        ValidationError)
 
-from .models import Order, OrderProduct, Product
+from places.geocoding_queue import enqueue_addresses
 
+from .idempotency import (IdempotencyConflict, claim_idempotency_key,
+                          save_idempotent_response)
+from .models import IdempotencyKey, Order, OrderProduct, Product
+from .renderers import ApiJSONRenderer
+from .sales import get_lines, record_new_orders
+from .snapshots import banners_snapshot, products_snapshot
 
+
+@condition(etag_func=banners_snapshot.get_etag)
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return banners_snapshot.render(request)
 
 
+@condition(etag_func=products_snapshot.get_etag)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return products_snapshot.render(request)
 
 
 class ProductsSerializer(ModelSerializer):
+    product = IntegerField(min_value=1)
 
     class Meta:
         model = OrderProduct
@@ -71,16 +38,65 @@ class ProductsSerializer(ModelSerializer):
         ]
 
 
+def get_total_price(products):
+    """Сумма заказа по проверенному составу из OrderSerializer."""
+    return sum(
+        product['product'].price * product['quantity']
+        for product in products
+    )
+
+
 class OrderSerializer(ModelSerializer):
+    """Заказ с составом.
+
+    Товары можно передать заранее загруженными в context['products']
+    как словарь id -> Product, тогда валидация не ходит в базу.
+    """
+
     products = ProductsSerializer(
         many=True,
         allow_empty=False,
         write_only=True
     )
 
+    def validate_products(self, products):
+        if 'products' in self.context:
+            found_products = self.context['products']
+        else:
+            found_products = Product.objects.in_bulk(
+                {product['product'] for product in products}
+            )
+        does_not_exist = PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+
+        errors = [
+            {} if product['product'] in found_products else {
+                'product': [does_not_exist.format(pk_value=product['product'])]
+            }
+            for product in products
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+
+        for product in products:
+            product['product'] = found_products[product['product']]
+        return products
+
     def create(self, validated_data):
-        validated_data.pop('products')
-        new_order = Order.objects.create(**validated_data)
+        products = validated_data.pop('products')
+        new_order = Order.objects.create(
+            total_price=get_total_price(products),
+            **validated_data
+        )
+        order_products = OrderProduct.objects.bulk_create([
+            OrderProduct(order=new_order,
+                         product=product['product'],
+                         quantity=product['quantity'],
+                         price=product['product'].price)
+            for product in products
+        ])
+        record_new_orders([(new_order, get_lines(order_products))])
         return new_order
 
     class Meta:
@@ -95,22 +111,42 @@ class OrderSerializer(ModelSerializer):
 
 
 @api_view(['POST'])
+@renderer_classes([ApiJSONRenderer])
 @transaction.atomic
 def register_order(request):
+    key = request.headers.get('Idempotency-Key')
+    idempotency_key = None
+    if key:
+        max_length = IdempotencyKey._meta.get_field('key').max_length
+        if len(key) > max_length:
+            return Response(
+                {'detail': f'Ключ длиннее {max_length} символов'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            idempotency_key, is_replay = claim_idempotency_key(
+                key, request.data
+            )
+        except IdempotencyConflict as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if is_replay:
+            response = Response(
+                idempotency_key.response_data,
+                status=idempotency_key.response_status,
+            )
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    new_products = serializer.validated_data['products']
     new_order = serializer.save()
-
-    new_order_products = [
-        OrderProduct(order=new_order,
-                     product=product['product'],
-                     quantity=product['quantity'],
-                     price=Product.objects.get(pk=product['product'].id).price)
-        for product in new_products
-    ]
-
-    OrderProduct.objects.bulk_create(new_order_products)
+    enqueue_addresses([new_order.address])
     new_order_serialized = OrderSerializer(new_order)
 
-    return Response(new_order_serialized.data)
+    response = Response(new_order_serialized.data)
+    if idempotency_key:
+        save_idempotent_response(idempotency_key, new_order, response)
+    return response
@@ -0,0 +1,12 @@
+import re
+
+
+def normalize_address(address):
+    """Приводит адрес к виду, по которому ищутся уже известные места.
+
+    Регистр, буква «ё», знаки препинания и лишние пробелы не влияют на
+    результат: «ул. Лёнина 5» и «ул.Ленина, 5 » дают одинаковый ключ.
+    """
+    address = address.casefold().replace('ё', 'е')
+    address = re.sub(r'[\W_]+', ' ', address)
+    return ' '.join(address.split())
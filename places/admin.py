@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Place
+from .models import GeocodingTask, Place
 
 
 @admin.register(Place)
 class PlaceAdmin(admin.ModelAdmin):
     list_display = ['address', 'lon', 'lat']
 
+
+@admin.register(GeocodingTask)
+class GeocodingTaskAdmin(admin.ModelAdmin):
+    list_display = ['address', 'status', 'attempts', 'next_attempt_at']
+    list_filter = ['status']
+    search_fields = ['address']
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class PlacesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'places'
+
+    def ready(self):
+        from .geocoders import check_geocoder
+
+        checks.register(check_geocoder)
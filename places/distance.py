@@ -0,0 +1,152 @@
+from math import asin, cos, radians, sin, sqrt
+
+import numpy as np
+from geopy import distance
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_haversine_distance(lat1, lon1, lat2, lon2):
+    """Расстояние в километрах между двумя точками по формуле гаверсинусов."""
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    half_chord = (
+        sin((lat2 - lat1) / 2) ** 2
+        + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(half_chord, 1)))
+
+
+def get_geodesic_distance(lat1, lon1, lat2, lon2):
+    return distance.distance((lat1, lon1), (lat2, lon2)).km
+
+
+def get_distance(lat1, lon1, lat2, lon2, method='haversine'):
+    """Расстояние в километрах между двумя точками выбранным методом."""
+    if method == 'haversine':
+        return get_haversine_distance(lat1, lon1, lat2, lon2)
+    if method == 'geodesic':
+        return get_geodesic_distance(lat1, lon1, lat2, lon2)
+    raise ValueError(f'Unknown distance method: {method}')
+
+
+def get_haversine_matrix(origins, destinations):
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(
+        np.asarray(destinations, dtype=float).reshape(-1, 2)
+    )
+    origin_lats = origins[:, 0, np.newaxis]
+    origin_lons = origins[:, 1, np.newaxis]
+    destination_lats = destinations[np.newaxis, :, 0]
+    destination_lons = destinations[np.newaxis, :, 1]
+
+    half_chord = (
+        np.sin((destination_lats - origin_lats) / 2) ** 2
+        + np.cos(origin_lats) * np.cos(destination_lats)
+        * np.sin((destination_lons - origin_lons) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(half_chord, 0, 1)))
+
+
+def get_geodesic_matrix(origins, destinations):
+    return np.array([
+        [distance.distance(origin, destination).km
+         for destination in destinations]
+        for origin in origins
+    ], dtype=float).reshape(len(origins), len(destinations))
+
+
+def get_distance_matrix(origins, destinations, method='haversine'):
+    """Матрица расстояний в километрах между двумя списками точек.
+
+    Точки задаются парами (широта, долгота). Метод `haversine` считает
+    всю матрицу векторно по формуле гаверсинусов, `geodesic` точнее,
+    но вызывает geopy для каждой пары.
+    """
+    if method == 'haversine':
+        return get_haversine_matrix(origins, destinations)
+    if method == 'geodesic':
+        return get_geodesic_matrix(origins, destinations)
+    raise ValueError(f'Unknown distance method: {method}')
+
+
+def get_nearest(distance_matrix, k=None, mask=None):
+    """Индексы ближайших точек назначения для каждой строки матрицы.
+
+    `mask` — булева матрица того же размера, ложные ячейки пропускаются.
+    Возвращает список списков индексов, отсортированных по расстоянию.
+    """
+    distance_matrix = np.asarray(distance_matrix, dtype=float)
+    if mask is not None:
+        distance_matrix = np.where(mask, distance_matrix, np.inf)
+
+    columns_count = distance_matrix.shape[1]
+    if k is None or k >= columns_count:
+        nearest = np.argsort(distance_matrix, axis=1, kind='stable')
+    else:
+        nearest = np.argpartition(distance_matrix, k - 1, axis=1)[:, :k]
+        rows = np.arange(distance_matrix.shape[0])[:, np.newaxis]
+        order = np.argsort(distance_matrix[rows, nearest], axis=1)
+        nearest = nearest[rows, order]
+
+    return [
+        [int(column) for column in row_columns
+         if np.isfinite(row_distances[column])]
+        for row_columns, row_distances in zip(nearest, distance_matrix)
+    ]
+
+
+def get_greedy_assignment(distance_matrix, capacities, mask=None, k=8):
+    """Жадно распределяет строки матрицы по столбцам с учётом ёмкости.
+
+    Пары (строка, столбец) перебираются от ближайших к дальним: строка
+    достаётся столбцу, если она ещё не распределена и у столбца осталось
+    место. Сначала берутся только `k` ближайших столбцов каждой строки,
+    строки без места пересчитываются с большим `k`. Возвращает массив
+    номеров столбцов, -1 — строку распределить не удалось.
+    """
+    distance_matrix = np.asarray(distance_matrix, dtype=float)
+    if mask is not None:
+        distance_matrix = np.where(mask, distance_matrix, np.inf)
+    rows_count, columns_count = distance_matrix.shape
+
+    assignment = [-1] * rows_count
+    remaining = [int(capacity) for capacity in capacities]
+    pending = np.arange(rows_count)
+    while pending.size and columns_count:
+        k = min(k, columns_count)
+        open_columns = np.array(remaining) > 0
+        distances = np.where(open_columns, distance_matrix[pending], np.inf)
+        if k < columns_count:
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(
+                np.arange(columns_count), distances.shape
+            )
+
+        pair_distances = np.take_along_axis(distances, nearest, axis=1)\
+            .ravel()
+        pair_rows = np.repeat(pending, k)
+        pair_columns = nearest.ravel()
+        finite = np.isfinite(pair_distances)
+        pairs_order = np.argsort(pair_distances[finite], kind='stable')
+
+        for row, column in zip(
+            pair_rows[finite][pairs_order].tolist(),
+            pair_columns[finite][pairs_order].tolist(),
+        ):
+            if assignment[row] == -1 and remaining[column] > 0:
+                assignment[row] = column
+                remaining[column] -= 1
+
+        if k == columns_count:
+            break
+        open_columns = np.array(remaining) > 0
+        pending = pending[
+            (np.array(assignment)[pending] == -1)
+            & np.isfinite(
+                np.where(open_columns, distance_matrix[pending], np.inf)
+            ).any(axis=1)
+        ]
+        k *= 4
+    return np.array(assignment, dtype=int)
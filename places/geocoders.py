@@ -0,0 +1,254 @@
+import csv
+import hashlib
+import time
+from functools import lru_cache
+from threading import Lock
+
+import requests
+from django.conf import settings
+from django.core.checks import Warning
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .address import normalize_address
+
+
+class Geocoder:
+    """Геокодер: превращает адрес в координаты (долгота, широта).
+
+    Если адрес не найден, geocode возвращает (None, None). Временные
+    ошибки, после которых стоит повторить запрос, выбрасываются как
+    requests.RequestException. Ответы геокодеров с `cacheable = True`
+    запоминаются в кэше GEOCODER_CACHE_ALIAS.
+    """
+
+    cacheable = False
+
+    def is_available(self):
+        """Можно ли сейчас обращаться к геокодеру."""
+        return True
+
+    def geocode(self, address):
+        raise NotImplementedError
+
+
+class GeocoderUnavailable(requests.RequestException):
+    """Геокодер недоступен или не настроен, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """Размыкатель: после нескольких ошибок подряд отказывает сразу.
+
+    Разомкнувшись, он `cooldown` секунд не пропускает запросы. Затем
+    пропускает один пробный: если тот удался, счётчик ошибок сбрасывается,
+    если нет — размыкатель снова ждёт `cooldown` секунд. Состояние общее
+    для всех потоков процесса.
+    """
+
+    def __init__(self, threshold, cooldown, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = Lock()
+        self._failures = 0
+        self._opened_until = None
+
+    def is_open(self):
+        with self._lock:
+            return (
+                self._opened_until is not None
+                and self.clock() < self._opened_until
+            )
+
+    def allow_request(self):
+        with self._lock:
+            if self._opened_until is None:
+                return True
+            now = self.clock()
+            if now < self._opened_until:
+                return False
+            # Пробный запрос: остальные ждут, пока он не завершится
+            self._opened_until = now + self.cooldown
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_until = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_until = self.clock() + self.cooldown
+
+
+class YandexGeocoder(Geocoder):
+    """HTTP API Яндекс-геокодера.
+
+    Запросы идут через общую для процесса сессию с пулом keep-alive
+    соединений, таймаутами и повторами при 429 и 5xx. Если геокодер
+    несколько раз подряд не ответил, размыкатель на время отказывает
+    сразу, выбрасывая GeocoderUnavailable. Так же он ведёт себя, если
+    не задан YANDEX_API_KEY.
+    """
+
+    cacheable = True
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key=None, url=None):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = (
+            settings.GEOCODER_CONNECT_TIMEOUT,
+            settings.GEOCODER_READ_TIMEOUT,
+        )
+        self.breaker = CircuitBreaker(
+            settings.GEOCODER_BREAKER_THRESHOLD,
+            settings.GEOCODER_BREAKER_COOLDOWN,
+        )
+        self.session = self.create_session()
+
+    def create_session(self):
+        retry = Retry(
+            total=settings.GEOCODER_RETRIES,
+            backoff_factor=settings.GEOCODER_RETRY_BACKOFF,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=['GET'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_maxsize=settings.GEOCODER_MAX_WORKERS,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_api_key(self):
+        return self.api_key or settings.YANDEX_API_KEY
+
+    def is_available(self):
+        return bool(self.get_api_key()) and not self.breaker.is_open()
+
+    def geocode(self, address):
+        api_key = self.get_api_key()
+        if not api_key:
+            # Без ключа адреса остаются в очереди, а не роняют запрос
+            raise GeocoderUnavailable('YANDEX_API_KEY is not set')
+        if not self.breaker.allow_request():
+            raise GeocoderUnavailable(
+                f'Geocoder is unavailable, skipping {address!r}'
+            )
+        try:
+            response = self.session.get(
+                self.url or settings.YANDEX_GEOCODER_URL,
+                params={
+                    "geocode": address,
+                    "apikey": api_key,
+                    "format": "json",
+                },
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+
+        if not found_places:
+            return None, None
+
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        return float(lon), float(lat)
+
+
+class GazetteerGeocoder(Geocoder):
+    """Справочник адресов из CSV-файла с колонками address, lon, lat.
+
+    Файл читается один раз при первом запросе и хранится в памяти как
+    словарь по нормализованному адресу, поэтому поиск не ходит ни в сеть,
+    ни на диск.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.GEOCODER_GAZETTEER_PATH
+        self._lock = Lock()
+        self._coordinates = None
+
+    def _load(self):
+        coordinates = {}
+        with open(self.path, newline='', encoding='utf-8') as gazetteer:
+            for row in csv.DictReader(gazetteer):
+                coordinates[normalize_address(row['address'])] = (
+                    float(row['lon']),
+                    float(row['lat']),
+                )
+        return coordinates
+
+    def _get_coordinates(self):
+        with self._lock:
+            if self._coordinates is None:
+                self._coordinates = self._load()
+            return self._coordinates
+
+    def geocode(self, address):
+        return self._get_coordinates().get(
+            normalize_address(address), (None, None)
+        )
+
+
+class FakeGeocoder(Geocoder):
+    """Детерминированные координаты из хэша адреса, без сети и файлов.
+
+    Одинаково написанные адреса получают одну точку внутри
+    GEOCODER_FAKE_BOUNDS (мин. долгота, мин. широта, макс. долгота,
+    макс. широта). Подходит для тестов, разработки и бенчмарков.
+    """
+
+    def __init__(self, bounds=None):
+        self.bounds = bounds or settings.GEOCODER_FAKE_BOUNDS
+
+    def geocode(self, address):
+        key = normalize_address(address)
+        if not key:
+            return None, None
+        address_hash = hashlib.sha1(key.encode()).digest()
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        lon_share = int.from_bytes(address_hash[:4], 'big') / 2 ** 32
+        lat_share = int.from_bytes(address_hash[4:8], 'big') / 2 ** 32
+        return (
+            round(min_lon + (max_lon - min_lon) * lon_share, 6),
+            round(min_lat + (max_lat - min_lat) * lat_share, 6),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_geocoder():
+    """Геокодер, выбранный в настройке GEOCODER_BACKEND."""
+    return import_string(settings.GEOCODER_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    if setting.startswith('GEOCODER_'):
+        get_geocoder.cache_clear()
+
+
+def check_geocoder(app_configs, **kwargs):
+    geocoder = get_geocoder()
+    if isinstance(geocoder, YandexGeocoder) and not geocoder.get_api_key():
+        return [
+            Warning(
+                'YANDEX_API_KEY is not set, addresses will not be geocoded.',
+                hint='Set YANDEX_API_KEY or choose another GEOCODER_BACKEND.',
+                id='places.W001',
+            )
+        ]
+    return []
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .address import normalize_address
+from .geocoders import get_geocoder
+from .get_place import find_places, geocode_places
+from .models import GeocodingTask
+
+
+def enqueue_addresses(addresses):
+    """Ставит адреса в очередь геокодирования, пропуская уже известные."""
+    addresses = {
+        normalize_address(address): address
+        for address in addresses if address
+    }.values()
+    known_places = find_places(addresses)
+
+    GeocodingTask.objects.bulk_create(
+        [
+            GeocodingTask(address=address)
+            for address in addresses
+            if address not in known_places
+            or known_places[address].lon is None
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def get_retry_delay(attempts):
+    delay = settings.GEOCODER_QUEUE_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(
+        seconds=min(delay, settings.GEOCODER_QUEUE_MAX_BACKOFF)
+    )
+
+
+def claim_due_tasks(batch_size):
+    """Забирает пачку задач, откладывая их на время обработки.
+
+    Пока задача в работе, другие воркеры её не увидят, а если воркер упадёт,
+    задача вернётся в очередь после GEOCODER_QUEUE_LEASE секунд.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            GeocodingTask.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=0, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        GeocodingTask.objects.filter(
+            pk__in=[task.pk for task in tasks]
+        ).update(
+            next_attempt_at=now + timedelta(
+                seconds=settings.GEOCODER_QUEUE_LEASE
+            )
+        )
+    return tasks
+
+
+def process_due_tasks(batch_size=50):
+    """Геокодирует пачку задач из очереди.
+
+    Возвращает количество обработанных и отложенных задач. Пока геокодер
+    недоступен, задачи не забираются, чтобы не тратить их попытки.
+    """
+    if not get_geocoder().is_available():
+        return 0, 0
+    tasks = claim_due_tasks(batch_size)
+    if not tasks:
+        return 0, 0
+
+    places, failed_addresses = geocode_places(
+        [task.address for task in tasks]
+    )
+
+    done_tasks = []
+    failed_tasks = []
+    now = timezone.now()
+    for task in tasks:
+        # Готово, если геокодер ответил, даже если адрес он не нашёл
+        if task.address in places and task.address not in failed_addresses:
+            done_tasks.append(task)
+            continue
+
+        task.attempts += 1
+        task.last_error = 'Геокодер не ответил'
+        if task.attempts >= settings.GEOCODER_QUEUE_MAX_ATTEMPTS:
+            task.status = 1
+        else:
+            task.next_attempt_at = now + get_retry_delay(task.attempts)
+        failed_tasks.append(task)
+
+    GeocodingTask.objects.filter(
+        pk__in=[task.pk for task in done_tasks]
+    ).delete()
+    GeocodingTask.objects.bulk_update(
+        failed_tasks,
+        ['attempts', 'last_error', 'status', 'next_attempt_at'],
+    )
+    return len(done_tasks), len(failed_tasks)
@@ -0,0 +1,87 @@
+from math import cos, pi, radians
+
+from .distance import EARTH_RADIUS_KM
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_LENGTH = 9
+KM_PER_DEGREE = EARTH_RADIUS_KM * pi / 180
+
+
+def encode_geohash(lat, lon, length=GEOHASH_LENGTH):
+    """Геохеш точки: чем длиннее общий префикс, тем ближе точки."""
+    if lat is None or lon is None:
+        return ''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bits_count = 0
+    is_lon_bit = True
+    while len(geohash) < length:
+        value, value_range = (lon, lon_range) if is_lon_bit else (
+            lat, lat_range
+        )
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        is_lon_bit = not is_lon_bit
+
+        bits_count += 1
+        if bits_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bits_count = 0
+    return ''.join(geohash)
+
+
+def get_cell_size(length):
+    """Размер ячейки геохеша заданной длины: (градусы широты, долготы)."""
+    lon_bits = (5 * length + 1) // 2
+    lat_bits = 5 * length // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def get_bounding_box(lat, lon, radius_km):
+    """Прямоугольник вокруг круга радиусом radius_km.
+
+    Возвращает минимальную и максимальную широту, затем долготу.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    farthest_lat_cos = cos(radians(min(abs(lat) + lat_delta, 90)))
+    if farthest_lat_cos * 180 <= lat_delta:
+        lon_delta = 360
+    else:
+        lon_delta = lat_delta / farthest_lat_cos
+    return (
+        max(lat - lat_delta, -90),
+        min(lat + lat_delta, 90),
+        max(lon - lon_delta, -180),
+        min(lon + lon_delta, 180),
+    )
+
+
+def get_covering_prefixes(min_lat, max_lat, min_lon, max_lon):
+    """Префиксы геохешей, ячейки которых покрывают прямоугольник.
+
+    Берётся самая мелкая длина, у которой ячейка не меньше прямоугольника,
+    поэтому префиксов не больше четырёх. Пустой список — прямоугольник
+    слишком большой и фильтровать по префиксу бессмысленно.
+    """
+    length = 0
+    for candidate_length in range(1, GEOHASH_LENGTH + 1):
+        lat_size, lon_size = get_cell_size(candidate_length)
+        if lat_size < max_lat - min_lat or lon_size < max_lon - min_lon:
+            break
+        length = candidate_length
+    if not length:
+        return []
+    return sorted({
+        encode_geohash(lat, lon, length)
+        for lat in (min_lat, max_lat)
+        for lon in (min_lon, max_lon)
+    })
@@ -1,33 +1,167 @@
-from .models import Place
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from django.conf import settings
+from django.core.cache import caches
+
+from .address import normalize_address
+from .geocoders import get_geocoder
+from .geohash import encode_geohash
+from .models import Place
+
+
+def get_place(address):
+    return get_places([address]).get(address)
+
+
+def find_places_by_key(keys):
+    places_by_key = {}
+    for place in Place.objects.filter(normalized_address__in=keys):
+        known_place = places_by_key.get(place.normalized_address)
+        if known_place is None or known_place.lon is None:
+            places_by_key[place.normalized_address] = place
+    return places_by_key
+
+
+def find_places(addresses):
+    """Возвращает уже известные адреса без обращения к геокодеру.
+
+    Адреса сравниваются по нормализованному ключу, поэтому разные
+    написания одного адреса находят одно и то же место.
+    """
+    keys = {address: normalize_address(address) for address in addresses}
+    places_by_key = find_places_by_key(set(keys.values()))
+    return {
+        address: places_by_key[key]
+        for address, key in keys.items()
+        if key in places_by_key
+    }
+
+
+def get_places(addresses):
+    """Возвращает словарь адрес -> Place для списка адресов.
+
+    Уже известные адреса достаются из базы одним запросом, остальные
+    геокодируются параллельно через общий пул соединений геокодера,
+    по одному запросу на нормализованный адрес. Адреса, которые не удалось
+    геокодировать из-за сетевой ошибки, возвращаются такими, какими они
+    уже были в базе, или не попадают в результат.
+    """
+    places, _ = geocode_places(addresses)
+    return places
+
+
+def geocode_places(addresses):
+    """Как get_places, но ещё возвращает адреса, где геокодер не ответил.
+
+    Возвращает пару (адрес -> Place, множество адресов с сетевой ошибкой).
+    """
+    keys = {
+        address: normalize_address(address)
+        for address in addresses if address
+    }
+    places_by_key = find_places_by_key(set(keys.values()))
+
+    missing_addresses = {}
+    for address, key in keys.items():
+        place = places_by_key.get(key)
+        if place is None or place.lon is None or place.lat is None:
+            missing_addresses.setdefault(key, address)
+
+    failed_keys = set()
+    if missing_addresses:
+        failed_keys = geocode_missing_places(missing_addresses, places_by_key)
+
+    places = {
+        address: places_by_key[key]
+        for address, key in keys.items()
+        if key in places_by_key
+    }
+    failed_addresses = {
+        address for address, key in keys.items() if key in failed_keys
+    }
+    return places, failed_addresses
+
+
+def geocode_missing_places(missing_addresses, places_by_key):
+    """Геокодирует адреса и сохраняет найденное в places_by_key и базу.
+
+    Возвращает ключи адресов, для которых геокодер не ответил.
+    """
+    max_workers = min(settings.GEOCODER_MAX_WORKERS, len(missing_addresses))
+
+    def fetch(address):
+        try:
+            return fetch_coordinates(address)
+        except requests.RequestException:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        found_coordinates = list(
+            executor.map(fetch, missing_addresses.values())
+        )
+
+    new_places = []
+    updated_places = []
+    failed_keys = set()
+    for (key, address), coordinates in zip(
+        missing_addresses.items(), found_coordinates
+    ):
+        if coordinates is None:
+            failed_keys.add(key)
+            continue
+        lon, lat = coordinates
+        if key in places_by_key:
+            place = places_by_key[key]
+            place.lon, place.lat = lon, lat
+            place.geohash = encode_geohash(lat, lon)
+            updated_places.append(place)
+        else:
+            place = Place(
+                address=address,
+                normalized_address=key,
+                lon=lon,
+                lat=lat,
+                geohash=encode_geohash(lat, lon),
+            )
+            new_places.append(place)
+        places_by_key[key] = place
+
+    Place.objects.bulk_create(new_places, ignore_conflicts=True)
+    Place.objects.bulk_update(updated_places, ['lon', 'lat', 'geohash'])
+    return failed_keys
+
+
+def get_coordinates_cache_key(address):
+    address_hash = hashlib.sha1(
+        normalize_address(address).encode()
+    ).hexdigest()
+    return f'places:coordinates:{address_hash}'
+
+
+def fetch_coordinates(address):
+    """Геокодирует адрес выбранным в настройках геокодером.
+
+    Если геокодер кэшируемый, запоминаются и найденные, и ненайденные
+    адреса: ответ «ничего не найдено» хранится GEOCODER_NEGATIVE_CACHE_TTL,
+    чтобы не спрашивать геокодер о нём при каждой загрузке страницы.
+    Сетевые ошибки не кэшируются.
+    """
+    geocoder = get_geocoder()
+    if not geocoder.cacheable:
+        return geocoder.geocode(address)
 
+    cache = caches[settings.GEOCODER_CACHE_ALIAS]
+    cache_key = get_coordinates_cache_key(address)
+    coordinates = cache.get(cache_key)
+    if coordinates is not None:
+        return coordinates
 
-def get_place(api_key, address):
-    place, _ = Place.objects.get_or_create(
-        address=address
-    )
-    if not place.lon or not place.lat:
-        place_coordinates = fetch_coordinates(api_key, address)
-        for lon, lat in place_coordinates:
-            place.lon = lon
-            place.lat = lat
-        place.save()
-    return place
-
-
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-
-    if not found_places:
-        return None, None
-
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+    coordinates = geocoder.geocode(address)
+    if None in coordinates:
+        timeout = settings.GEOCODER_NEGATIVE_CACHE_TTL
+    else:
+        timeout = settings.GEOCODER_CACHE_TTL
+    cache.set(cache_key, coordinates, timeout=timeout)
+    return coordinates
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy import distance
+
+from places.distance import (get_distance_matrix, get_greedy_assignment,
+                             get_nearest)
+
+
+def legacy_restaurant_distances(orders, restaurants):
+    all_distances = []
+    for order in orders:
+        restaurant_distances = []
+        for number, restaurant in enumerate(restaurants):
+            rest_distance = distance.distance(restaurant, order).km
+            restaurant_distances.append((number, round(rest_distance, 2)))
+            restaurant_distances = sorted(
+                restaurant_distances, key=lambda rest_dist: rest_dist[1]
+            )
+        all_distances.append(restaurant_distances)
+    return all_distances
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает попарный расчёт расстояний через geopy с матричным '
+        'расчётом на случайных точках в пределах Москвы, а также '
+        'жадное распределение заказов по ресторанам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders', type=int, nargs='+', default=[10, 100, 1000],
+        )
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--top', type=int, default=5)
+        parser.add_argument(
+            '--assign-orders', type=int, default=5000,
+            help='Сколько заказов распределять по ресторанам',
+        )
+        parser.add_argument(
+            '--assign-restaurants', type=int, default=200,
+        )
+
+    def handle(self, *args, **options):
+        random = np.random.default_rng(0)
+        restaurants = self.get_random_points(random, options['restaurants'])
+
+        self.stdout.write(
+            'orders\trestaurants\tgeopy, s\thaversine, s\t'
+            'geodesic, s\tmax error, km'
+        )
+        for orders_count in options['orders']:
+            orders = self.get_random_points(random, orders_count)
+
+            started_at = time.perf_counter()
+            legacy_restaurant_distances(orders, restaurants)
+            legacy_time = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            haversine = get_distance_matrix(orders, restaurants)
+            get_nearest(haversine, k=options['top'])
+            haversine_time = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            geodesic = get_distance_matrix(
+                orders, restaurants, method='geodesic'
+            )
+            get_nearest(geodesic, k=options['top'])
+            geodesic_time = time.perf_counter() - started_at
+
+            self.stdout.write(
+                f'{orders_count}\t{len(restaurants)}\t{legacy_time:.4f}\t'
+                f'{haversine_time:.4f}\t{geodesic_time:.4f}\t'
+                f'{np.abs(haversine - geodesic).max():.3f}'
+            )
+
+        self.bench_assignment(
+            random, options['assign_orders'], options['assign_restaurants']
+        )
+
+    def bench_assignment(self, random, orders_count, restaurants_count):
+        orders = self.get_random_points(random, orders_count)
+        restaurants = self.get_random_points(random, restaurants_count)
+        mask = random.random((orders_count, restaurants_count)) < 0.8
+        capacity = int(orders_count * 1.2 / restaurants_count) + 1
+
+        started_at = time.perf_counter()
+        distances = get_distance_matrix(orders, restaurants)
+        assignment = get_greedy_assignment(
+            distances, [capacity] * restaurants_count, mask=mask,
+        )
+        elapsed = time.perf_counter() - started_at
+
+        assigned = assignment != -1
+        mean_distance = distances[
+            np.flatnonzero(assigned), assignment[assigned]
+        ].mean()
+        self.stdout.write(
+            f'Распределение {orders_count} заказов по {restaurants_count} '
+            f'ресторанам (ёмкость {capacity}): {elapsed:.3f} с, '
+            f'назначено {assigned.sum()}, среднее расстояние '
+            f'{mean_distance:.2f} км'
+        )
+
+    @staticmethod
+    def get_random_points(random, count):
+        lats = random.uniform(55.55, 55.95, count)
+        lons = random.uniform(37.35, 37.85, count)
+        return list(zip(lats, lons))
@@ -0,0 +1,30 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from places.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет известные координаты адресов в CSV-справочник'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.GEOCODER_GAZETTEER_PATH,
+            help='Куда записать справочник',
+        )
+
+    def handle(self, *args, **options):
+        places = Place.objects.exclude(lon=None).exclude(lat=None) \
+            .order_by('id').values_list('address', 'lon', 'lat')
+
+        places_count = 0
+        with open(options['path'], 'w', newline='', encoding='utf-8') as gazetteer:
+            writer = csv.writer(gazetteer)
+            writer.writerow(['address', 'lon', 'lat'])
+            for place in places.iterator():
+                writer.writerow(place)
+                places_count += 1
+
+        self.stdout.write(f'Записано адресов: {places_count}')
@@ -0,0 +1,46 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from places.geocoding_queue import enqueue_addresses, process_due_tasks
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди в фоне'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь один раз и выйти',
+        )
+        parser.add_argument(
+            '--enqueue-open-orders', action='store_true',
+            help='Поставить в очередь адреса необработанных заказов',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_open_orders']:
+            order_model = apps.get_model('foodcartapp', 'Order')
+            enqueue_addresses(
+                order_model.objects.filter(status__lte=2)
+                .values_list('address', flat=True)
+            )
+
+        while True:
+            done, postponed = process_due_tasks(
+                batch_size=options['batch_size'],
+            )
+            if done or postponed:
+                self.stdout.write(
+                    f'Геокодировано: {done}, отложено: {postponed}'
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from places.address import normalize_address
+
+
+def fill_normalized_address(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    places = Place.objects.only('address').iterator()
+    updated_places = []
+    for place in places:
+        place.normalized_address = normalize_address(place.address)
+        updated_places.append(place)
+    Place.objects.bulk_update(
+        updated_places, ['normalized_address'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0003_geocodingtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(default='', db_index=True, editable=False, max_length=100, verbose_name='Нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_address, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+from places.geohash import encode_geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    places = Place.objects.filter(
+        lat__isnull=False, lon__isnull=False,
+    ).only('lat', 'lon').iterator()
+    updated_places = []
+    for place in places:
+        place.geohash = encode_geohash(place.lat, place.lon)
+        updated_places.append(place)
+    Place.objects.bulk_update(updated_places, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0004_place_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=9, verbose_name='Геохеш'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
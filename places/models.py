@@ -1,6 +1,49 @@
+from operator import attrgetter
+
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .address import normalize_address
+from .distance import get_haversine_distance
+from .geohash import (GEOHASH_LENGTH, encode_geohash, get_bounding_box,
+                      get_covering_prefixes)
+
+
+class GeohashQuerySet(models.QuerySet):
+    """Поиск по близости для моделей с полями lat, lon и geohash."""
+
+    def near(self, lat, lon, radius_km):
+        """Объекты не дальше radius_km от точки, ближние первыми.
+
+        База отбирает кандидатов по префиксам геохеша и прямоугольнику
+        вокруг круга, точное расстояние считается только для них и
+        записывается в атрибут `distance`.
+        """
+        min_lat, max_lat, min_lon, max_lon = get_bounding_box(
+            lat, lon, radius_km
+        )
+        prefixes_filter = Q()
+        for prefix in get_covering_prefixes(
+            min_lat, max_lat, min_lon, max_lon
+        ):
+            prefixes_filter |= Q(geohash__startswith=prefix)
+        candidates = self.filter(
+            prefixes_filter,
+            lat__range=(min_lat, max_lat),
+            lon__range=(min_lon, max_lon),
+        )
+
+        nearby = []
+        for candidate in candidates:
+            candidate.distance = get_haversine_distance(
+                lat, lon, candidate.lat, candidate.lon
+            )
+            if candidate.distance <= radius_km:
+                nearby.append(candidate)
+        return sorted(nearby, key=attrgetter('distance'))
+
 
 # Create your models here.
 class Place(models.Model):
@@ -9,6 +52,12 @@ class Place(models.Model):
         max_length=100,
         unique=True,
     )
+    normalized_address = models.CharField(
+        'Нормализованный адрес',
+        max_length=100,
+        db_index=True,
+        editable=False,
+    )
     created_add = models.TimeField(
         auto_now_add=True,
         verbose_name='Дата создания'
@@ -31,6 +80,15 @@ class Place(models.Model):
         blank=True,
         null=True
     )
+    geohash = models.CharField(
+        'Геохеш',
+        max_length=GEOHASH_LENGTH,
+        db_index=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = GeohashQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Адрес заказа'
@@ -38,3 +96,45 @@ class Place(models.Model):
 
     def __str__(self):
         return self.address
+
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        self.geohash = encode_geohash(self.lat, self.lon)
+        super().save(*args, **kwargs)
+
+
+class GeocodingTask(models.Model):
+    address = models.CharField(
+        'Адрес',
+        max_length=100,
+        unique=True,
+    )
+    status = models.SmallIntegerField(
+        choices=[
+            (0, 'Ожидает'),
+            (1, 'Не удалось геокодировать'),
+        ],
+        db_index=True,
+        default=0,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток',
+        default=0,
+    )
+    next_attempt_at = models.DateTimeField(
+        'Следующая попытка',
+        default=timezone.now,
+        db_index=True,
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Задача геокодирования'
+        verbose_name_plural = 'Задачи геокодирования'
+
+    def __str__(self):
+        return self.address
@@ -1,3 +1,366 @@
-from django.test import TestCase
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import requests
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .distance import get_haversine_distance
+from .geocoders import (
+    CircuitBreaker,
+    FakeGeocoder,
+    Geocoder,
+    GazetteerGeocoder,
+    GeocoderUnavailable,
+    YandexGeocoder,
+    check_geocoder,
+)
+from .geohash import encode_geohash
+from .geocoding_queue import (claim_due_tasks, enqueue_addresses,
+                              process_due_tasks)
+from .get_place import get_places
+from .models import GeocodingTask, Place
+
+
+STUB_COORDINATES = {
+    'Москва, Красная площадь, 1': '37.620795 55.753930',
+    'Москва, Тверская, 7': '37.612766 55.759185',
+}
+
+
+class GeocoderStubHandler(BaseHTTPRequestHandler):
+    requested_addresses = []
+
+    def do_GET(self):
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        self.requested_addresses.append(address)
+
+        if address not in STUB_COORDINATES:
+            found_places = []
+        else:
+            found_places = [
+                {'GeoObject': {'Point': {'pos': STUB_COORDINATES[address]}}}
+            ]
+        body = json.dumps({
+            'response': {
+                'GeoObjectCollection': {'featureMember': found_places}
+            }
+        }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GetPlacesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), GeocoderStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        host, port = cls.server.server_address
+        cls.settings_override = override_settings(
+            GEOCODER_BACKEND='places.geocoders.YandexGeocoder',
+            YANDEX_API_KEY='api-key',
+            YANDEX_GEOCODER_URL=f'http://{host}:{port}/1.x',
+            GEOCODER_MAX_WORKERS=4,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        GeocoderStubHandler.requested_addresses = []
+        caches['geocoder'].clear()
+
+    def test_geocodes_unique_missing_addresses_once(self):
+        Place.objects.create(address='Москва, Арбат, 1', lon=37.6, lat=55.75)
+        addresses = [
+            'Москва, Красная площадь, 1',
+            'Москва, Тверская, 7',
+            'Москва, Красная площадь, 1',
+            'Москва, Арбат, 1',
+        ]
+
+        with self.assertNumQueries(2):
+            places = get_places(addresses)
+
+        self.assertCountEqual(GeocoderStubHandler.requested_addresses, [
+            'Москва, Красная площадь, 1',
+            'Москва, Тверская, 7',
+        ])
+        self.assertEqual(len(places), 3)
+        self.assertAlmostEqual(places['Москва, Тверская, 7'].lon, 37.612766)
+        self.assertAlmostEqual(places['Москва, Тверская, 7'].lat, 55.759185)
+        self.assertEqual(Place.objects.count(), 3)
+
+    def test_saves_unknown_address_without_coordinates(self):
+        places = get_places(['Нигде, 0'])
+
+        self.assertIsNone(places['Нигде, 0'].lon)
+        self.assertTrue(Place.objects.filter(address='Нигде, 0').exists())
+
+    def test_caches_unknown_address(self):
+        get_places(['Нигде, 0'])
+        get_places(['Нигде, 0'])
+
+        self.assertEqual(GeocoderStubHandler.requested_addresses, ['Нигде, 0'])
+
+    def test_matches_differently_written_address(self):
+        Place.objects.create(address='ул. Ленина 5', lon=37.6, lat=55.75)
+
+        places = get_places(['ул.Ленина, 5 '])
+
+        self.assertEqual(GeocoderStubHandler.requested_addresses, [])
+        self.assertEqual(places['ул.Ленина, 5 '].address, 'ул. Ленина 5')
+
+
+class NearQueryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        for number in range(200):
+            Place.objects.create(
+                address=f'Адрес {number}',
+                lat=generator.uniform(55.55, 55.95),
+                lon=generator.uniform(37.35, 37.85),
+            )
+        Place.objects.create(address='Нигде, 0')
+
+    def test_saves_geohash(self):
+        place = Place.objects.get(address='Адрес 0')
+
+        self.assertEqual(place.geohash, encode_geohash(place.lat, place.lon))
+        self.assertEqual(Place.objects.get(address='Нигде, 0').geohash, '')
+
+    def test_matches_full_scan(self):
+        all_places = list(Place.objects.exclude(lat=None))
+        for lat, lon, radius_km in [
+            (55.75, 37.62, 0.5),
+            (55.75, 37.62, 3),
+            (55.6, 37.4, 10),
+            (55.9, 37.8, 40),
+        ]:
+            expected_addresses = sorted(
+                (get_haversine_distance(lat, lon, place.lat, place.lon),
+                 place.address)
+                for place in all_places
+            )
+            expected_addresses = [
+                address for place_distance, address in expected_addresses
+                if place_distance <= radius_km
+            ]
+
+            nearby_places = Place.objects.near(lat, lon, radius_km)
+
+            self.assertEqual(
+                [place.address for place in nearby_places],
+                expected_addresses,
+            )
+
+
+class GeocoderBackendTest(TestCase):
+    def test_fake_geocoder_is_deterministic(self):
+        geocoder = FakeGeocoder(bounds=(37.0, 55.0, 38.0, 56.0))
+
+        lon, lat = geocoder.geocode('Москва, Тверская, 7')
+
+        self.assertEqual(geocoder.geocode('москва,тверская 7'), (lon, lat))
+        self.assertTrue(37.0 <= lon <= 38.0 and 55.0 <= lat <= 56.0)
+        self.assertEqual(geocoder.geocode('  '), (None, None))
+
+    def test_gazetteer_geocoder(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'gazetteer.csv')
+            with open(path, 'w', encoding='utf-8') as gazetteer:
+                gazetteer.write(
+                    'address,lon,lat\n"Москва, Тверская, 7",37.61,55.76\n'
+                )
+            geocoder = GazetteerGeocoder(path=path)
+
+            self.assertEqual(
+                geocoder.geocode('москва, тверская 7'), (37.61, 55.76)
+            )
+            self.assertEqual(geocoder.geocode('Нигде, 0'), (None, None))
+
+    @override_settings(
+        GEOCODER_BACKEND='places.geocoders.YandexGeocoder',
+        YANDEX_API_KEY='',
+    )
+    def test_skips_addresses_without_api_key(self):
+        self.assertEqual(get_places(['Москва, Тверская, 7']), {})
+        self.assertEqual(
+            [warning.id for warning in check_geocoder(None)], ['places.W001']
+        )
+
+    @override_settings(GEOCODER_BACKEND='places.geocoders.FakeGeocoder')
+    def test_get_places_uses_configured_backend(self):
+        places = get_places(['Москва, Тверская, 7'])
+
+        self.assertEqual(
+            (places['Москва, Тверская, 7'].lon,
+             places['Москва, Тверская, 7'].lat),
+            FakeGeocoder().geocode('Москва, Тверская, 7'),
+        )
+
+
+class CircuitBreakerTest(TestCase):
+    def test_opens_after_consecutive_failures(self):
+        now = [0]
+        breaker = CircuitBreaker(
+            threshold=2, cooldown=10, clock=lambda: now[0],
+        )
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+
+        now[0] = 11
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertTrue(breaker.allow_request())
+
+    def test_geocoder_fails_fast_when_open(self):
+        with socket.socket() as unused_socket:
+            unused_socket.bind(('127.0.0.1', 0))
+            host, port = unused_socket.getsockname()
+
+        with override_settings(
+            YANDEX_API_KEY='api-key',
+            YANDEX_GEOCODER_URL=f'http://{host}:{port}/1.x',
+            GEOCODER_RETRIES=0,
+            GEOCODER_BREAKER_THRESHOLD=2,
+        ):
+            geocoder = YandexGeocoder()
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    geocoder.geocode('Москва, Тверская, 7')
+
+            self.assertFalse(geocoder.is_available())
+            with self.assertRaises(GeocoderUnavailable):
+                geocoder.geocode('Москва, Тверская, 7')
+
+
+class OfflineGeocoder(Geocoder):
+    def geocode(self, address):
+        raise requests.ConnectionError('Геокодер не отвечает')
+
+
+class NotFoundGeocoder(Geocoder):
+    def geocode(self, address):
+        return None, None
+
+
+class RecordingGeocoder(FakeGeocoder):
+    requested_addresses = []
+
+    def geocode(self, address):
+        self.requested_addresses.append(address)
+        return super().geocode(address)
+
+
+@override_settings(
+    GEOCODER_BACKEND='places.tests.OfflineGeocoder',
+    GEOCODER_QUEUE_BACKOFF=30,
+    GEOCODER_QUEUE_MAX_BACKOFF=3600,
+    GEOCODER_QUEUE_MAX_ATTEMPTS=3,
+    GEOCODER_QUEUE_LEASE=300,
+)
+class GeocodingQueueTest(TestCase):
+    def make_tasks_due(self):
+        GeocodingTask.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_enqueues_each_unknown_address_once(self):
+        Place.objects.create(address='Москва, Арбат, 1', lon=37.6, lat=55.75)
+        Place.objects.create(address='Нигде, 0')
+
+        enqueue_addresses([
+            'Москва, Арбат, 1',
+            'москва,тверская 7',
+            'Москва, Тверская, 7',
+            'Нигде, 0',
+            '',
+        ])
+        enqueue_addresses(['Москва, Тверская, 7', 'Нигде, 0'])
+
+        self.assertCountEqual(
+            GeocodingTask.objects.values_list('address', flat=True),
+            ['Москва, Тверская, 7', 'Нигде, 0'],
+        )
+
+    def test_backs_off_on_network_errors(self):
+        # Место без координат должно геокодироваться заново, а не считаться
+        # найденным
+        Place.objects.create(address='Нигде, 0')
+        enqueue_addresses(['Москва, Тверская, 7', 'Нигде, 0'])
+
+        started_at = timezone.now()
+        self.assertEqual(process_due_tasks(), (0, 2))
+        self.make_tasks_due()
+        self.assertEqual(process_due_tasks(), (0, 2))
+
+        for task in GeocodingTask.objects.all():
+            self.assertEqual(task.attempts, 2)
+            self.assertEqual(task.status, 0)
+            self.assertEqual(task.last_error, 'Геокодер не ответил')
+            self.assertGreaterEqual(
+                task.next_attempt_at, started_at + timedelta(seconds=60)
+            )
+            self.assertLess(
+                task.next_attempt_at,
+                timezone.now() + timedelta(seconds=61),
+            )
+
+    def test_gives_up_after_max_attempts(self):
+        enqueue_addresses(['Москва, Тверская, 7'])
+
+        for _ in range(3):
+            self.make_tasks_due()
+            process_due_tasks()
+
+        task = GeocodingTask.objects.get()
+        self.assertEqual((task.status, task.attempts), (1, 3))
+        self.make_tasks_due()
+        self.assertEqual(process_due_tasks(), (0, 0))
+
+    @override_settings(GEOCODER_BACKEND='places.tests.NotFoundGeocoder')
+    def test_done_when_geocoder_answers(self):
+        enqueue_addresses(['Нигде, 0'])
+
+        self.assertEqual(process_due_tasks(), (1, 0))
+
+        self.assertFalse(GeocodingTask.objects.exists())
+        self.assertIsNone(Place.objects.get(address='Нигде, 0').lon)
+
+    def test_reclaims_task_after_lease(self):
+        enqueue_addresses(['Москва, Тверская, 7'])
+
+        self.assertEqual(len(claim_due_tasks(10)), 1)
+        self.assertEqual(claim_due_tasks(10), [])
+
+        # Воркер упал, срок аренды истёк
+        self.make_tasks_due()
+        self.assertEqual(len(claim_due_tasks(10)), 1)
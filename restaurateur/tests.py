@@ -1,3 +1,316 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from foodcartapp.availability import availability_index
+from foodcartapp.restaurant_index import restaurant_index
+from foodcartapp.models import (Order, OrderProduct, Product, ProductSales,
+                                Restaurant, RestaurantMenuItem,
+                                RestaurantSales)
+from foodcartapp.sales import rebuild_sales
+from places.models import Place
+from places.tests import RecordingGeocoder
+
+
+class ViewOrdersQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            username='manager', password='manager', is_staff=True
+        )
+        cls.restaurants = [
+            Restaurant.objects.create(
+                name=f'Ресторан {number}',
+                address=f'Адрес ресторана {number}',
+                lat=55.75 + number / 100,
+                lon=37.6,
+            )
+            for number in range(3)
+        ]
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {number}', price=100, image='burger.jpg'
+            )
+            for number in range(3)
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in cls.restaurants
+            for product in cls.products
+        )
+        Place.objects.create(address='Адрес заказа 0', lat=55.7, lon=37.6)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+        # Сигналы срабатывают после коммита, а TestCase его не делает
+        availability_index.reset()
+        restaurant_index.reset()
+
+    def create_orders(self, count):
+        orders = Order.objects.bulk_create(
+            Order(
+                phonenumber='+79161234567',
+                firstname=f'Клиент {number}',
+                address=f'Адрес заказа {number % 2}',
+                cook_restaurant=self.restaurants[0] if number % 3 else None,
+            )
+            for number in range(count)
+        )
+        orders = Order.objects.all()
+        OrderProduct.objects.bulk_create(
+            OrderProduct(
+                order=order,
+                product=product,
+                quantity=1,
+                price=product.price,
+            )
+            for order in orders
+            for product in self.products[:2]
+        )
+
+    def assert_orders_page_queries(self, orders_count):
+        self.create_orders(orders_count)
+
+        # Индексы наличия и ресторанов строятся при первом запросе
+        with self.assertNumQueries(8):
+            response = self.client.get(
+                reverse('restaurateur:view_orders'), {'page_size': 200}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context['orders']), min(orders_count, 200)
+        )
+
+    @override_settings(GEOCODER_BACKEND='places.tests.RecordingGeocoder')
+    def test_does_not_geocode_orders(self):
+        RecordingGeocoder.requested_addresses = []
+        # Адрес заказа 1 ещё не геокодирован, его разберёт очередь
+        self.create_orders(4)
+
+        response = self.client.get(reverse('restaurateur:view_orders'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RecordingGeocoder.requested_addresses, [])
+
+    def test_10_orders(self):
+        self.assert_orders_page_queries(10)
+
+    def test_1000_orders(self):
+        self.assert_orders_page_queries(1000)
+
+    def test_pages_cover_all_orders_once(self):
+        self.create_orders(120)
+        seen_order_ids = []
+        query = {'page_size': 50}
+
+        while query is not None:
+            response = self.client.get(
+                reverse('restaurateur:view_orders'), query
+            )
+            seen_order_ids += [order.id for order in response.context['orders']]
+            query = response.context['next_page_query']
+            if query is not None:
+                query = QueryDict(query)
+
+        self.assertEqual(
+            seen_order_ids,
+            list(Order.objects.order_by('registered_at', 'id')
+                 .values_list('id', flat=True)),
+        )
+
+    def test_filters_unassigned_orders(self):
+        self.create_orders(9)
+
+        response = self.client.get(
+            reverse('restaurateur:view_orders'), {'cook_restaurant': 'none'}
+        )
+
+        self.assertEqual(len(response.context['orders']), 3)
+        self.assertTrue(all(
+            order.cook_restaurant is None
+            for order in response.context['orders']
+        ))
+
+    @override_settings(ORDERS_POLL_TIMEOUT=0)
+    def test_updates_contain_only_changed_orders(self):
+        self.create_orders(3)
+        Order.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        since = timezone.now()
+        closed_order, changed_order, _ = Order.objects.order_by('id')
+        closed_order.status = 3
+        closed_order.save()
+        changed_order.comment = 'Позвонить заранее'
+        changed_order.save()
+
+        with self.assertNumQueries(8):
+            response = self.client.get(
+                reverse('restaurateur:view_orders_updates'),
+                {'since': since.isoformat(), 'version': 0},
+            )
+
+        updates = response.json()
+        self.assertEqual(
+            [order['id'] for order in updates['orders']], [changed_order.id]
+        )
+        self.assertIn('Позвонить заранее', updates['orders'][0]['html'])
+        self.assertEqual(updates['removed'], [closed_order.id])
+
+    def test_updates_reject_naive_since(self):
+        response = self.client.get(
+            reverse('restaurateur:view_orders_updates'),
+            {'since': '2020-01-01T00:00:00', 'version': 0},
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_assigns_restaurants_within_capacity(self):
+        self.create_orders(9)
+        Restaurant.objects.filter(pk=self.restaurants[0].pk).update(capacity=6)
+        Restaurant.objects.filter(pk=self.restaurants[1].pk).update(capacity=1)
+
+        response = self.client.post(reverse('restaurateur:assign_orders'))
+
+        self.assertEqual(response.status_code, 302)
+        located_orders = Order.objects.filter(
+            address='Адрес заказа 0', cook_restaurant__isnull=True,
+        )
+        self.assertFalse(located_orders.exists())
+        self.assertEqual(
+            Order.objects.filter(cook_restaurant=self.restaurants[1]).count(),
+            1,
+        )
+        self.assertEqual(
+            Order.objects.filter(cook_restaurant=self.restaurants[2]).count(),
+            1,
+        )
+        self.assertEqual(
+            Order.objects.filter(cook_restaurant__isnull=True).count(), 1
+        )
+
+    def test_shows_nearest_capable_restaurants(self):
+        self.create_orders(1)
+        RestaurantMenuItem.objects.filter(
+            restaurant=self.restaurants[0], product=self.products[0],
+        ).update(availability=False)
+        availability_index.reset()
+
+        with self.settings(NEAREST_RESTAURANTS_COUNT=1):
+            response = self.client.get(reverse('restaurateur:view_orders'))
+
+        order, = response.context['orders']
+        self.assertEqual(
+            [name for name, _ in order.restaurant_distances], ['Ресторан 1']
+        )
+
+
+class SalesRollupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            username='manager', password='manager', is_staff=True
+        )
+        cls.restaurant = Restaurant.objects.create(
+            name='Ресторан', address='Адрес ресторана', lat=55.75, lon=37.6,
+        )
+        cls.products = [
+            Product.objects.create(
+                name=f'Товар {number}', price=100 + number, image='burger.jpg'
+            )
+            for number in range(2)
+        ]
+
+    def post_order(self, quantities):
+        response = self.client.post(
+            '/api/order/',
+            {
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79161234567',
+                'address': 'Адрес заказа',
+                'products': [
+                    {'product': product.id, 'quantity': quantity}
+                    for product, quantity in zip(self.products, quantities)
+                ],
+            },
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return Order.objects.latest('id')
+
+    def add_order_in_admin(self, quantity):
+        admin_user = User.objects.create_superuser(
+            username='admin', password='admin',
+        )
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:foodcartapp_order_add'), {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79161234567',
+            'address': 'Адрес заказа',
+            'status': 0,
+            'payment_method': 0,
+            'comment': '',
+            'cook_restaurant': self.restaurant.id,
+            'ordered_products-TOTAL_FORMS': 1,
+            'ordered_products-INITIAL_FORMS': 0,
+            'ordered_products-0-product': self.products[0].id,
+            'ordered_products-0-quantity': quantity,
+            'ordered_products-0-price': self.products[0].price,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.client.logout()
+
+    def get_rollups(self):
+        fields = ['period', 'period_start', 'status', 'orders_count',
+                  'quantity', 'revenue']
+        return (
+            sorted(
+                RestaurantSales.objects.exclude(orders_count=0)
+                .values_list('restaurant', *fields)
+            ),
+            sorted(
+                ProductSales.objects.exclude(orders_count=0)
+                .values_list('product', *fields)
+            ),
+        )
+
+    def test_incremental_rollups_match_rebuild(self):
+        first_order = self.post_order([1, 2])
+        second_order = self.post_order([3])
+        first_order.cook_restaurant = self.restaurant
+        first_order.save()
+        second_order.cook_restaurant = self.restaurant
+        second_order.status = 1
+        second_order.save()
+        first_order.delete()
+        self.post_order([2, 1])
+        self.add_order_in_admin(quantity=2)
+
+        incremental_rollups = self.get_rollups()
+        rebuild_sales()
+
+        self.assertEqual(incremental_rollups, self.get_rollups())
+
+    def test_report_shows_restaurant_sales(self):
+        order = self.post_order([1, 2])
+        order.cook_restaurant = self.restaurant
+        order.save()
+        self.client.force_login(self.manager)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('restaurateur:view_sales'))
+
+        self.assertEqual(
+            response.context['totals'],
+            [{
+                'name': 'Ресторан',
+                'orders_count': 1,
+                'quantity': 3,
+                'revenue': 302,
+            }],
+        )
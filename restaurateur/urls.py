@@ -14,6 +14,11 @@ urlpatterns = [
 
     # TODO заглушка для нереализованного функционала
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/updates/', views.view_orders_updates,
+         name="view_orders_updates"),
+    path('orders/assign/', views.assign_orders, name="assign_orders"),
+
+    path('sales/', views.view_sales, name="view_sales"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
@@ -1,17 +1,49 @@
-from requests import RequestException
+from datetime import datetime, time, timedelta
+
 from django import forms
 from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db.models import F, Q, Sum
 from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views import View
-from geopy import distance
+from django.views.decorators.http import require_POST
+
+from foodcartapp.assignment import assign_open_orders
+from foodcartapp.availability import availability_index
+from foodcartapp.models import (SALES_PERIODS, Order, Product, ProductSales,
+                                Restaurant, RestaurantSales)
+from foodcartapp.order_changes import get_orders_version, wait_for_orders_change
+from foodcartapp.renderers import render_json
+from foodcartapp.restaurant_index import restaurant_index
+from places.get_place import find_places
+
+
+ORDERS_PAGE_SIZES = [50, 100, 200, 500]
+ORDERS_UPDATES_LIMIT = 200
+# Заказ сохраняется раньше, чем коммитится, поэтому окно изменений
+# перекрывается: строка может прийти дважды, но не потеряется
+ORDERS_UPDATES_OVERLAP = timedelta(seconds=5)
+
+SALES_REPORT_DAYS = 30
+SALES_HOURLY_MAX_DAYS = 7
 
-from foodcartapp.models import Order, Product, Restaurant
-from places.get_place import get_place, fetch_coordinates
-from places.models import Place
+
+def encode_orders_cursor(order):
+    cursor = f'{order.registered_at.isoformat()}|{order.id}'
+    return urlsafe_base64_encode(cursor.encode())
+
+
+def decode_orders_cursor(cursor):
+    registered_at, order_id = urlsafe_base64_decode(cursor)\
+        .decode().split('|')
+    return datetime.fromisoformat(registered_at), int(order_id)
 
 
 class Login(forms.Form):
@@ -31,6 +63,119 @@ class Login(forms.Form):
     )
 
 
+class OrderFilter(forms.Form):
+    status = forms.TypedChoiceField(
+        label='Статус',
+        choices=[('', 'Все необработанные')] + [
+            choice for choice in Order._meta.get_field('status').choices
+            if choice[0] <= 2
+        ],
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+    payment_method = forms.TypedChoiceField(
+        label='Способ оплаты',
+        choices=[('', 'Любой')] + list(
+            Order._meta.get_field('payment_method').choices
+        ),
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+    cook_restaurant = forms.ChoiceField(
+        label='Ресторан',
+        required=False,
+    )
+    page_size = forms.TypedChoiceField(
+        label='Заказов на странице',
+        choices=[(size, size) for size in ORDERS_PAGE_SIZES],
+        coerce=int,
+        empty_value=ORDERS_PAGE_SIZES[0],
+        required=False,
+    )
+    after = forms.CharField(
+        widget=forms.HiddenInput,
+        required=False,
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['cook_restaurant'].choices = [
+            ('', 'Любой'),
+            ('none', 'Не назначен'),
+        ] + [
+            (str(restaurant_id), name)
+            for restaurant_id, name in
+            Restaurant.objects.order_by('name').values_list('id', 'name')
+        ]
+
+    def clean_after(self):
+        cursor = self.cleaned_data['after']
+        if not cursor:
+            return None
+        try:
+            return decode_orders_cursor(cursor)
+        except ValueError:
+            raise forms.ValidationError('Неверная ссылка на страницу')
+
+
+class SalesFilter(forms.Form):
+    date_from = forms.DateField(
+        label='С',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False,
+    )
+    date_to = forms.DateField(
+        label='По',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False,
+    )
+    group_by = forms.ChoiceField(
+        label='Разрез',
+        choices=[
+            ('restaurant', 'Рестораны'),
+            ('product', 'Товары'),
+        ],
+        required=False,
+    )
+    period = forms.TypedChoiceField(
+        label='Период',
+        choices=SALES_PERIODS,
+        coerce=int,
+        empty_value=SALES_PERIODS[1][0],
+        required=False,
+    )
+    status = forms.TypedChoiceField(
+        label='Статус',
+        choices=[('', 'Все')] + list(
+            Order._meta.get_field('status').choices
+        ),
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_to = cleaned_data.get('date_to') or timezone.localdate()
+        date_from = cleaned_data.get('date_from') or (
+            date_to - timedelta(days=SALES_REPORT_DAYS - 1)
+        )
+        if date_from > date_to:
+            raise forms.ValidationError('Начало периода позже конца')
+        if cleaned_data.get('period') == SALES_PERIODS[0][0] and (
+            date_to - date_from
+        ).days >= SALES_HOURLY_MAX_DAYS:
+            raise forms.ValidationError(
+                f'По часам можно смотреть не больше '
+                f'{SALES_HOURLY_MAX_DAYS} дней'
+            )
+        cleaned_data['date_from'] = date_from
+        cleaned_data['date_to'] = date_to
+        return cleaned_data
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -69,16 +214,13 @@ def is_manager(user):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    products = list(Product.objects.all())
 
     products_with_restaurant_availability = []
     for product in products:
-        availability = {
-            item.restaurant_id: item.availability
-            for item in product.menu_items.all()
-        }
+        restaurants_bitmap = availability_index.get_bitmap(product.id)
         ordered_availability = [
-            availability.get(restaurant.id, False)
+            bool(restaurants_bitmap >> restaurant.id & 1)
             for restaurant in restaurants
         ]
 
@@ -103,52 +245,218 @@ def view_restaurants(request):
     })
 
 
+def filter_orders(orders, filters):
+    if filters.get('status') is None:
+        orders = orders.filter(status__lte=2)
+    else:
+        orders = orders.filter(status=filters['status'])
+
+    if filters.get('payment_method') is not None:
+        orders = orders.filter(payment_method=filters['payment_method'])
+
+    if filters.get('cook_restaurant') == 'none':
+        orders = orders.filter(cook_restaurant__isnull=True)
+    elif filters.get('cook_restaurant'):
+        orders = orders.filter(cook_restaurant_id=filters['cook_restaurant'])
+
+    if filters.get('after'):
+        registered_at, order_id = filters['after']
+        orders = orders.filter(
+            Q(registered_at__gt=registered_at)
+            | Q(registered_at=registered_at, id__gt=order_id)
+        )
+    return orders.order_by('registered_at', 'id')
+
+
+def set_order_distances(orders):
+    places = find_places([order.address for order in orders])
+
+    for order in orders:
+        place = places.get(order.address)
+        if not place or place.lon is None or place.lat is None:
+            order.restaurant_distances = None
+            continue
+        nearest_restaurants = restaurant_index.get_nearest(
+            place.lat,
+            place.lon,
+            k=settings.NEAREST_RESTAURANTS_COUNT,
+            bitmap=order.restaurants_bitmap,
+            method=settings.DISTANCE_METHOD,
+        )
+        order.restaurant_distances = [
+            (restaurant.name, round(distance, 2))
+            for restaurant, distance in nearest_restaurants
+        ]
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    yandex_api_key = settings.YANDEX_API_KEY
+    updates_since = timezone.now() - ORDERS_UPDATES_OVERLAP
+    updates_version = get_orders_version()
+    filter_form = OrderFilter(request.GET)
+    filter_form.is_valid()
+    filters = filter_form.cleaned_data
+    page_size = filters.get('page_size') or ORDERS_PAGE_SIZES[0]
 
-    orders = Order.objects.filter(status__lte=2)\
-        .get_full_price().get_available_restaurants()
+    orders = filter_orders(Order.objects.all(), filters)\
+        .select_related('cook_restaurant')[:page_size + 1]
+    orders = orders.get_available_restaurants()
 
-    order_places = [order.address for order in orders]
-    places = Place.objects.filter(address__in=order_places)
+    next_page_query = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_page_query = request.GET.copy()
+        next_page_query['after'] = encode_orders_cursor(orders[-1])
+        next_page_query = next_page_query.urlencode()
 
-    for order in orders:
-        if order.address not in places.values_list('address', flat=True):
-            try:
-                place = get_place(yandex_api_key, order.address)
-            except RequestException:
-                order.restaurant_distances = None
-                continue
-        for place_db in places:
-            if place_db.address == order.address:
-                place = place_db
-
-        for rest in order.restaurants:
-            if not rest.lon or not rest.lat:
-                try:
-                    rest_coordinates = fetch_coordinates(
-                        yandex_api_key, rest.address
-                    )
-                except request.RequestException:
-                    order.restaurant_distances = None
-                    continue
-                for lon, lat in rest_coordinates:
-                    rest.lon = lon
-                    rest.lat = lat
-                rest.save()
-
-            rest_distance = distance.distance(
-                (rest.lat, rest.lon),
-                (place.lat, place.lon)
-            ).km
-            order.restaurant_distances.append(
-                (rest.name, round(rest_distance, 2))
-            )
-            order.restaurant_distances = sorted(
-                order.restaurant_distances, key=lambda rest_dist: rest_dist[1]
-            )
+    set_order_distances(orders)
+
+    first_page_query = request.GET.copy()
+    first_page_query.pop('after', None)
+
+    updates_query = first_page_query.copy()
+    updates_query['since'] = updates_since.isoformat()
+    updates_query['version'] = updates_version
 
     return render(request, template_name='order_items.html', context={
-        'orders': orders
+        'orders': orders,
+        'filter_form': filter_form,
+        'first_page_query': first_page_query.urlencode(),
+        'next_page_query': next_page_query,
+        'is_first_page': not filters.get('after'),
+        'updates_query': updates_query.urlencode(),
+        'page_query': request.GET.urlencode(),
+        'orders_page_path': request.get_full_path(),
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_updates(request):
+    """Long polling для страницы заказов: изменения после `since`.
+
+    Пока версия заказов в кэше не изменилась, запрос ждёт и не трогает
+    базу. Затем отдаёт строки таблицы для новых и изменённых заказов,
+    подходящих под фильтр, и id заказов, которые из-под фильтра ушли.
+    """
+    try:
+        since = datetime.fromisoformat(request.GET['since'])
+        version = int(request.GET['version'])
+        if timezone.is_naive(since):
+            raise ValueError('since must include a UTC offset')
+    except (KeyError, ValueError):
+        return render_json(request, {'error': 'Неверные параметры'}, 400)
+
+    filter_form = OrderFilter(request.GET)
+    filter_form.is_valid()
+    filters = filter_form.cleaned_data
+    filters['after'] = None
+
+    version = wait_for_orders_change(
+        version,
+        settings.ORDERS_POLL_TIMEOUT,
+        settings.ORDERS_POLL_INTERVAL,
+    )
+    updates_since = timezone.now() - ORDERS_UPDATES_OVERLAP
+
+    changed_orders = list(
+        Order.objects.filter(updated_at__gte=since)
+        .order_by('updated_at', 'id')
+        .values_list('id', 'updated_at')[:ORDERS_UPDATES_LIMIT + 1]
+    )
+    if len(changed_orders) > ORDERS_UPDATES_LIMIT:
+        return render_json(request, {'reload': True})
+
+    orders = filter_orders(
+        Order.objects.filter(id__in=[order_id for order_id, _ in changed_orders]),
+        filters,
+    ).select_related('cook_restaurant').get_available_restaurants()
+    set_order_distances(orders)
+
+    page_query = request.GET.copy()
+    page_query.pop('since', None)
+    page_query.pop('version', None)
+    orders_page_path = '{}?{}'.format(
+        reverse('restaurateur:view_orders'), page_query.urlencode(),
+    )
+    matching_ids = {order.id for order in orders}
+    return render_json(request, {
+        'since': updates_since.isoformat(),
+        'version': version,
+        'orders': [
+            {
+                'id': order.id,
+                'is_new': order.registered_at >= since,
+                'html': render_to_string('order_row.html', {
+                    'order': order,
+                    'orders_page_path': orders_page_path,
+                }, request=request),
+            }
+            for order in orders
+        ],
+        'removed': [
+            order_id for order_id, _ in changed_orders
+            if order_id not in matching_ids
+        ],
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+@require_POST
+def assign_orders(request):
+    assigned_orders = assign_open_orders()
+    messages.info(
+        request, f'Назначено ресторанов для заказов: {len(assigned_orders)}'
+    )
+    return redirect('{}?{}'.format(
+        reverse('restaurateur:view_orders'), request.POST.get('query', ''),
+    ))
+
+
+def get_sales_report(filters):
+    """Продажи за период по сводкам: строки по периодам и итоги."""
+    if filters['group_by'] == 'product':
+        sales = ProductSales.objects.all()
+        name_field = 'product__name'
+    else:
+        sales = RestaurantSales.objects.all()
+        name_field = 'restaurant__name'
+
+    sales = sales.filter(
+        period=filters['period'],
+        period_start__gte=timezone.make_aware(
+            datetime.combine(filters['date_from'], time.min)
+        ),
+        period_start__lt=timezone.make_aware(
+            datetime.combine(filters['date_to'] + timedelta(days=1), time.min)
+        ),
+    )
+    if filters['status'] is not None:
+        sales = sales.filter(status=filters['status'])
+
+    sales = sales.annotate(name=F(name_field))
+    totals = {
+        'orders_count': Sum('orders_count'),
+        'quantity': Sum('quantity'),
+        'revenue': Sum('revenue'),
+    }
+    rows = sales.values('period_start', 'name').annotate(**totals)\
+        .order_by('period_start', 'name')
+    name_totals = sales.values('name').annotate(**totals)\
+        .order_by('-revenue', 'name')
+    return list(rows), list(name_totals)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_sales(request):
+    filter_form = SalesFilter(request.GET)
+    rows, totals = [], []
+    if filter_form.is_valid():
+        rows, totals = get_sales_report(filter_form.cleaned_data)
+
+    return render(request, template_name='sales_report.html', context={
+        'filter_form': filter_form,
+        'rows': rows,
+        'totals': totals,
+        'is_hourly':
+            filter_form.cleaned_data.get('period') == SALES_PERIODS[0][0],
     })
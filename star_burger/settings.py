@@ -1,4 +1,6 @@
+import hashlib
 import os
+import tempfile
 
 import dj_database_url
 
@@ -91,13 +93,40 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+DB_URL = env.str('DB_URL')
 DATABASES = {
     'default': dj_database_url.parse(
-        env.str('DB_URL'),
+        DB_URL,
         conn_max_age=600,
     )
 }
 
+# Версии снимков API и индексов в памяти процессов хранятся в основном
+# кэше, поэтому он должен быть общим для всех процессов сайта
+CACHES = {
+    'default': env.dj_cache_url(
+        'CACHE_URL',
+        'file://{}?max_entries=10000'.format(
+            os.path.join(tempfile.gettempdir(), 'star-burger-cache')
+        ),
+    ),
+    'geocoder': env.dj_cache_url(
+        'GEOCODER_CACHE_URL',
+        'locmem://geocoder?max_entries=10000',
+    ),
+}
+# Снимки собраны по конкретной базе: при смене DB_URL кэш не должен
+# отдавать данные другой базы
+CACHES['default'].setdefault(
+    'KEY_PREFIX', hashlib.sha1(DB_URL.encode()).hexdigest()[:8]
+)
+TEST_RUNNER = 'star_burger.test_runner.TestRunner'
+
+API_SNAPSHOT_CACHE_TTL = env.int('API_SNAPSHOT_CACHE_TTL', 24 * 60 * 60)
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+ORDERS_POLL_TIMEOUT = env.int('ORDERS_POLL_TIMEOUT', 25)
+ORDERS_POLL_INTERVAL = env.float('ORDERS_POLL_INTERVAL', 1)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -135,4 +164,34 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
-YANDEX_API_KEY = env("YANDEX_API_KEY")
+YANDEX_API_KEY = env("YANDEX_API_KEY", "")
+YANDEX_GEOCODER_URL = env(
+    "YANDEX_GEOCODER_URL",
+    "https://geocode-maps.yandex.ru/1.x",
+)
+GEOCODER_MAX_WORKERS = env.int("GEOCODER_MAX_WORKERS", 8)
+GEOCODER_BACKEND = env.str(
+    "GEOCODER_BACKEND", "places.geocoders.YandexGeocoder"
+)
+GEOCODER_GAZETTEER_PATH = env.str(
+    "GEOCODER_GAZETTEER_PATH", os.path.join(BASE_DIR, "gazetteer.csv")
+)
+GEOCODER_FAKE_BOUNDS = (37.35, 55.55, 37.85, 55.95)
+GEOCODER_CONNECT_TIMEOUT = env.float("GEOCODER_CONNECT_TIMEOUT", 2)
+GEOCODER_READ_TIMEOUT = env.float("GEOCODER_READ_TIMEOUT", 5)
+GEOCODER_RETRIES = env.int("GEOCODER_RETRIES", 2)
+GEOCODER_RETRY_BACKOFF = env.float("GEOCODER_RETRY_BACKOFF", 0.3)
+GEOCODER_BREAKER_THRESHOLD = env.int("GEOCODER_BREAKER_THRESHOLD", 5)
+GEOCODER_BREAKER_COOLDOWN = env.float("GEOCODER_BREAKER_COOLDOWN", 30)
+DISTANCE_METHOD = env.str("DISTANCE_METHOD", "haversine")
+RESTAURANT_INDEX_CELL_SIZE = env.float("RESTAURANT_INDEX_CELL_SIZE", 0.02)
+NEAREST_RESTAURANTS_COUNT = env.int("NEAREST_RESTAURANTS_COUNT", 5)
+GEOCODER_CACHE_ALIAS = 'geocoder'
+GEOCODER_CACHE_TTL = env.int("GEOCODER_CACHE_TTL", 30 * 24 * 60 * 60)
+GEOCODER_NEGATIVE_CACHE_TTL = env.int(
+    "GEOCODER_NEGATIVE_CACHE_TTL", 24 * 60 * 60
+)
+GEOCODER_QUEUE_MAX_ATTEMPTS = env.int("GEOCODER_QUEUE_MAX_ATTEMPTS", 8)
+GEOCODER_QUEUE_BACKOFF = env.int("GEOCODER_QUEUE_BACKOFF", 30)
+GEOCODER_QUEUE_MAX_BACKOFF = env.int("GEOCODER_QUEUE_MAX_BACKOFF", 3600)
+GEOCODER_QUEUE_LEASE = env.int("GEOCODER_QUEUE_LEASE", 300)
@@ -0,0 +1,30 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'geocoder': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'geocoder',
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Запускает тесты с кэшами в памяти процесса.
+
+    Основной кэш по умолчанию файловый и общий с запущенным сайтом, поэтому
+    без подмены тесты получали бы снимки и версии, собранные по другой базе.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(CACHES=TEST_CACHES)
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)